@@ -1,6 +1,7 @@
-import json
 import sys
 
+from storage import get_storage
+
 def analyze_counts(posts_data):
     """
     Counts the number of unique posts and images per subreddit.
@@ -46,20 +47,16 @@ def analyze_counts(posts_data):
 
 # --- Main Script ---
 if __name__ == "__main__":
-    input_filename = 'cleaned_data.json'
-
-    try:
-        with open(input_filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ Error: The file '{input_filename}' was not found.")
-        print("Please run the previous script first to generate this file.")
-        sys.exit()
-    except json.JSONDecodeError:
-        print(f"❌ Error: Could not decode JSON from '{input_filename}'.")
+    collection = 'reddit'
+
+    # Read through storage so posts still in the append log (or in SQLite) are counted.
+    data = get_storage().load_items(collection)
+    if not data:
+        print(f"❌ Error: The '{collection}' collection is empty or could not be read.")
+        print("Please run the previous script first to generate it.")
         sys.exit()
 
-    print(f"📊 Analyzing '{input_filename}'...\n")
+    print(f"📊 Analyzing the '{collection}' collection...\n")
 
     # Get the stats from the analysis function
     stats = analyze_counts(data)
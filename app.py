@@ -3,8 +3,11 @@
 from flask import Flask, render_template # <-- Make sure render_template is imported
 from flask_cors import CORS
 
+import metrics
+import profiling
+
 # Import the blueprint objects from your refactored files
-from videos import video_bp, load_cache
+from videos import video_bp, load_cache, VIDEO_INDEX
 from gallery import gallery_bp
 from reddit import reddit_bp
 
@@ -17,6 +20,11 @@ app.register_blueprint(video_bp)
 app.register_blueprint(gallery_bp)
 app.register_blueprint(reddit_bp)
 
+# Request latency/size for every route above, plus the /metrics endpoint itself.
+metrics.init_app(app)
+# Opt-in cProfile capture for slow or flagged requests (PROFILE_REQUESTS=1, see profiling.py).
+profiling.init_app(app)
+
 
 # --- ADD THESE ROUTES ---
 # This is the fix. These routes tell Flask how to serve your HTML pages.
@@ -39,8 +47,13 @@ def reddit_page():
 # --- END OF FIX ---
 
 
+# Shared state is loaded at import time, not under __main__, so gunicorn workers
+# start warm. With preload_app (see gunicorn.conf.py) this runs once in the master
+# and the forked workers share the loaded cache and index copy-on-write.
+load_cache()
+VIDEO_INDEX.refresh()
+
+
 if __name__ == "__main__":
-    # The load_cache() call from your videos server can be run here at startup
-    load_cache()
     # Run the app on port 5000
     app.run(debug=True, port=5000)
\ No newline at end of file
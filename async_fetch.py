@@ -0,0 +1,207 @@
+# async_fetch.py
+
+"""
+asyncio fetch engine for the bulk tools.
+One event loop keeps hundreds of page downloads in flight with bounded overall
+concurrency, a semaphore per host, the shared per-host token buckets from
+rate_limiter, and retries with exponential backoff. Pages are parsed with
+page_extract.parse_page by default, so results match fetch_video_details
+exactly; a tool with its own extraction passes parse= instead.
+
+Parsing is CPU-bound and would serialize on the loop, so with parse workers
+the loop only downloads and hands raw bytes to a process pool of extractors.
+At most `concurrency` bodies are held at once (downloading or waiting for a
+parse slot), and at most `parse_backlog` are queued in the pool, so memory
+stays flat however long the URL list is.
+
+Synchronous callers use iter_fetch(), which runs the loop on a helper thread
+and yields results as they complete through a bounded queue.
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import http_client
+import rate_limiter
+from page_extract import _cache_page, parse_body
+
+ASYNC_CONCURRENCY = int(os.environ.get("ASYNC_CONCURRENCY", 256))
+ASYNC_PER_HOST = int(os.environ.get("ASYNC_PER_HOST", 64))
+ASYNC_RETRIES = int(os.environ.get("ASYNC_RETRIES", 3))
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+RESULT_BACKLOG = int(os.environ.get("ASYNC_RESULT_BACKLOG", 256))  # Finished pages waiting for iter_fetch's caller.
+
+_DONE = object()
+
+
+class FetchError(Exception):
+    """A page could not be fetched after all retries."""
+
+
+class FetchEngine:
+    """Fetches and parses video pages concurrently on one event loop."""
+
+    def __init__(self, concurrency=None, per_host=None, retries=None, timeout=None, headers=None,
+                 parse_pool=None, parse_backlog=None, parse=None):
+        self.concurrency = concurrency or ASYNC_CONCURRENCY
+        self.per_host = per_host or ASYNC_PER_HOST
+        self.retries = ASYNC_RETRIES if retries is None else retries
+        self.timeout = timeout or http_client.DEFAULT_TIMEOUT
+        self.headers = {**http_client.DEFAULT_HEADERS, **(headers or {})}
+        # parse(body, charset, final_url) must be a module-level function to run in the pool.
+        self.parse = parse or parse_body
+        self.parse_pool = parse_pool  # None parses on the loop itself.
+        self.parse_backlog = parse_backlog or 2 * PARSE_WORKERS
+        self._host_semaphores = {}
+        self._parse_slots = None
+
+    def _host_semaphore(self, host):
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._host_semaphores[host]
+
+    async def _get(self, session, url):
+        """Returns (body bytes, charset, final_url), retrying transient failures."""
+        host = urlsplit(url).netloc.lower()
+        bucket = rate_limiter.limiter_for(url)
+        for attempt in range(self.retries + 1):
+            if bucket:
+                wait = bucket.reserve()  # Never blocks the loop; the wait happens here instead.
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            start = time.perf_counter()
+            failed = True
+            try:
+                async with self._host_semaphore(host), session.get(url) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        retry_after = response.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else RETRY_BACKOFF * 2 ** attempt
+                        if response.status == 429 and bucket:
+                            bucket.pause(delay)
+                        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                        continue
+                    response.raise_for_status()
+                    body = await response.read()
+                    failed = False
+                    return body, response.charset, str(response.url)
+            except aiohttp.ClientResponseError as e:
+                # A 4xx other than 429 will not change on retry; don't spend quota on it.
+                if e.status not in RETRY_STATUSES or attempt >= self.retries:
+                    raise FetchError(f"{url}: {e!r}") from e
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(1, 1.5))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise FetchError(f"{url}: {e!r}") from e
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(1, 1.5))
+            finally:
+                http_client.record_request(host, time.perf_counter() - start, failed)
+        raise FetchError(f"{url}: gave up after {self.retries + 1} attempts")
+
+    async def fetch_page(self, session, url):
+        """Downloads and parses one page. Returns a page_extract.PageInfo, or what a custom parse returns."""
+        body, charset, final_url = await self._get(session, url)
+        if self.parse_pool is None:
+            info = self.parse(body, charset, final_url)
+        else:
+            if self._parse_slots is None:
+                self._parse_slots = asyncio.Semaphore(self.parse_backlog)
+            async with self._parse_slots:
+                info = await asyncio.get_running_loop().run_in_executor(
+                    self.parse_pool, self.parse, body, charset, final_url)
+        if self.parse is parse_body:
+            _cache_page(info, url, final_url)
+        return info
+
+    async def run(self, urls, on_result):
+        """Fetches every url, awaiting on_result(url, info, error) as each one finishes."""
+        gate = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers) as session:
+            async def one(url):
+                async with gate:
+                    try:
+                        info, error = await self.fetch_page(session, url), None
+                    except Exception as e:
+                        info, error = None, e
+                    await on_result(url, info, error)  # Inside the gate, so a slow consumer stalls fetching.
+
+            await asyncio.gather(*(one(url) for url in urls))
+
+
+def iter_fetch(urls, parse_workers=None, backlog=None, **engine_options):
+    """
+    Synchronous front end: yields (url, PageInfo or None, error or None) in
+    completion order. Stopping iteration early cancels the outstanding fetches.
+    Pages are parsed in a pool of parse_workers processes (default
+    PARSE_WORKERS); with one worker they are parsed on the loop.
+
+    Results wait in a queue of at most backlog (default RESULT_BACKLOG)
+    entries. When the caller falls behind, finished fetches block on the full
+    queue while still holding their concurrency slot, so downloading pauses
+    instead of buffering results without bound.
+    """
+    parse_workers = PARSE_WORKERS if parse_workers is None else parse_workers
+    if parse_workers > 1:
+        # spawn, not fork: this process already runs threads (the caller's and the loop's).
+        engine_options["parse_pool"] = ProcessPoolExecutor(
+            parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        engine_options.setdefault("parse_backlog", 2 * parse_workers)
+    engine = FetchEngine(**engine_options)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="async-fetch", daemon=True)
+    thread.start()
+
+    def call(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    async def start():
+        results = asyncio.Queue(backlog or RESULT_BACKLOG)
+        return results, asyncio.get_running_loop().create_task(
+            engine.run(list(urls), lambda *result: results.put(result)))
+
+    async def next_result():
+        # Waits for a result or for the fetches to end, whichever comes first.
+        if results.empty() and not producer.done():
+            getter = asyncio.ensure_future(results.get())
+            await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                return getter.result()
+            getter.cancel()
+        if not results.empty():
+            return results.get_nowait()
+        producer.result()  # Re-raises an error that ended the run.
+        return _DONE
+
+    async def stop():
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+    producer = None
+    try:
+        results, producer = call(start())
+        while True:
+            item = call(next_result())
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        try:
+            if producer is not None:
+                call(stop())
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            if engine.parse_pool is not None:
+                engine.parse_pool.shutdown(cancel_futures=True)
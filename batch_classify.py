@@ -0,0 +1,160 @@
+# batch_classify.py
+
+"""
+Vectorized whole-corpus classification for bulk rebuilds and rule experiments.
+The corpus is held as NumPy columns (actor counts plus keyword-hit bitmasks for
+title, channel and tags) and determine_sexuality's hierarchy is evaluated as
+boolean masks over every row at once. Keyword bits are extracted once per row;
+after that, re-running the hierarchy over 100k+ rows costs a few array passes.
+
+    python batch_classify.py --check    # exhaustive equivalence check against determine_sexuality
+"""
+import itertools
+import sys
+
+import numpy as np
+
+from classification_logic import determine_sexuality, finalize_tags
+
+# Keyword-hit bits, one per substring/membership test in determine_sexuality.
+TITLE_TRANS, TITLE_LESBIAN, TITLE_GAY, TITLE_STRAIGHT = 1, 2, 4, 8
+CHANNEL_TRANS, CHANNEL_LESBIAN, CHANNEL_GAY = 1, 2, 4
+TAG_FFM, TAG_MMF, TAG_LESBIAN, TAG_GAY, TAG_STRAIGHT = 1, 2, 4, 8, 16
+
+TAG_BITS = {
+    "ffm": TAG_FFM, "f/f/m": TAG_FFM, "mff": TAG_FFM,
+    "mmf": TAG_MMF, "m/m/f": TAG_MMF,
+    "lesbian": TAG_LESBIAN, "girl on girl": TAG_LESBIAN,
+    "gay": TAG_GAY, "straight": TAG_STRAIGHT,
+}
+
+
+def title_bits(title):
+    title = title.lower()
+    return ((TITLE_TRANS if 'trans' in title or 'transgender' in title else 0)
+            | (TITLE_LESBIAN if 'lesbian' in title else 0)
+            | (TITLE_GAY if 'gay' in title else 0)
+            | (TITLE_STRAIGHT if 'straight' in title else 0))
+
+
+def channel_bits(channel_name):
+    channel = channel_name.lower()
+    return ((CHANNEL_TRANS if 'trans' in channel else 0)
+            | (CHANNEL_LESBIAN if 'lesbian' in channel else 0)
+            | (CHANNEL_GAY if 'gay' in channel else 0))
+
+
+def tag_bits(tags):
+    bits = 0
+    for tag in tags:
+        bits |= TAG_BITS.get(tag.lower(), 0)
+    return bits
+
+
+def build_columns(rows):
+    """
+    Converts (male_count, female_count, trans_count, title, channel_name, tags)
+    rows into the column dict determine_sexuality_batch() works on.
+    """
+    rows = list(rows)
+    return {
+        "male": np.fromiter((r[0] for r in rows), dtype=np.int32, count=len(rows)),
+        "female": np.fromiter((r[1] for r in rows), dtype=np.int32, count=len(rows)),
+        "trans": np.fromiter((r[2] for r in rows), dtype=np.int32, count=len(rows)),
+        "title": np.fromiter((title_bits(r[3]) for r in rows), dtype=np.uint8, count=len(rows)),
+        "channel": np.fromiter((channel_bits(r[4]) for r in rows), dtype=np.uint8, count=len(rows)),
+        "tags": np.fromiter((tag_bits(r[5]) for r in rows), dtype=np.uint8, count=len(rows)),
+    }
+
+
+def _hierarchy(c):
+    """(condition, label) pairs in determine_sexuality's order; the first true one wins."""
+    m, f, t = c["male"], c["female"], c["trans"]
+    total = m + f + t
+    title, channel, tags = c["title"], c["channel"], c["tags"]
+    has = lambda bits, bit: (bits & bit) != 0
+
+    trans = t > 0
+    group5, group4, group3, couple, solo = total >= 5, total == 4, total == 3, total == 2, total == 1
+    return [
+        # 1. Trans
+        (trans & (t == 1) & (f > 0) & (m == 0), "Trans (T/F)"),
+        (trans & (t == 1) & (m > 0) & (f == 0), "Trans (T/M)"),
+        (trans & (m > 0) & (f > 0), "Trans Group"),
+        (trans, "Trans"),
+        (has(title, TITLE_TRANS) | has(channel, CHANNEL_TRANS), "Trans"),
+        # 2. Groups
+        (group5 & (m == 0), "Orgy (All-Female)"),
+        (group5 & (f == 0), "Orgy (All-Male)"),
+        (group5, "Orgy (Mixed)"),
+        (group4 & (f == 4), "Foursome (FFFF)"),
+        (group4 & (m == 4), "Foursome (MMMM)"),
+        (group4 & (f == 3) & (m == 1), "Foursome (FFFM)"),
+        (group4 & (m == 3) & (f == 1), "Foursome (MMMF)"),
+        (group4 & (f == 2) & (m == 2), "Foursome (FFMM)"),
+        (group4, "Foursome"),
+        (group3 & (f == 3), "Threesome (FFF)"),
+        (group3 & (m == 3), "Threesome (MMM)"),
+        (group3 & (f == 2) & (m == 1), "Threesome (FFM)"),
+        (group3 & (m == 2) & (f == 1), "Threesome (MMF)"),
+        (group3 & has(tags, TAG_FFM), "Threesome (FFM)"),
+        (group3 & has(tags, TAG_MMF), "Threesome (MMF)"),
+        (group3, "Threesome"),
+        # 3. Couples and 4. solos (no catch-all: unmatched mixes fall through)
+        (couple & (f == 2), "Lesbian (F/F)"),
+        (couple & (m == 2), "Gay (M/M)"),
+        (couple & (m == 1) & (f == 1), "Straight (M/F)"),
+        (solo & (f == 1), "Solo (Female)"),
+        (solo & (m == 1), "Solo (Male)"),
+        # 5. Title/channel fallback
+        (has(title, TITLE_LESBIAN) | has(channel, CHANNEL_LESBIAN), "Lesbian"),
+        (has(title, TITLE_GAY) | has(channel, CHANNEL_GAY), "Gay"),
+        (has(title, TITLE_STRAIGHT), "Straight"),
+        # 6. Tag fallback
+        (has(tags, TAG_LESBIAN), "Lesbian"),
+        (has(tags, TAG_GAY), "Gay"),
+        (has(tags, TAG_STRAIGHT), "Straight"),
+    ]
+
+
+def determine_sexuality_batch(columns):
+    """Returns an array with determine_sexuality's label for every row of columns."""
+    rules = _hierarchy(columns)
+    labels = np.array([label for _, label in rules] + ["Uncategorized"], dtype=object)
+    codes = np.select([cond for cond, _ in rules], np.arange(len(rules)), default=len(rules))
+    return labels[codes]
+
+
+def classify_corpus(videos):
+    """
+    Batch equivalent of classify_many: (title, channel_name, scraped_tags,
+    male_actors, female_actors, trans_actors) tuples in, tag lists out.
+    """
+    videos = list(videos)
+    columns = build_columns((len(m), len(f), len(t), title, channel, tags)
+                            for title, channel, tags, m, f, t in videos)
+    primaries = determine_sexuality_batch(columns)
+    return [finalize_tags(primary, video[0], video[2]) for primary, video in zip(primaries, videos)]
+
+
+def check_equivalence():
+    """Compares the batch path with determine_sexuality over every count/keyword combination."""
+    titles = ["", "Trans", "transgender", "Lesbian", "gay", "Straight", "lesbian gay straight"]
+    channels = ["", "TransTV", "lesbian", "gay"]
+    tag_sets = [set(), {"ffm"}, {"M/M/F"}, {"girl on girl"}, {"Gay"}, {"straight"}, {"ffm", "mmf", "lesbian"}]
+    rows = [(m, f, t, title, channel, tags)
+            for m, f, t in itertools.product(range(7), repeat=3)
+            for title, channel, tags in itertools.product(titles, channels, tag_sets)]
+    expected = [determine_sexuality(*row) for row in rows]
+    actual = determine_sexuality_batch(build_columns(rows))
+    mismatches = [(row, e, a) for row, e, a in zip(rows, expected, actual) if e != a]
+    print(f"Checked {len(rows)} combinations: {len(mismatches)} mismatches.")
+    for row, e, a in mismatches[:10]:
+        print(f"  {row}: expected {e!r}, got {a!r}")
+    return not mismatches
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        sys.exit(0 if check_equivalence() else 1)
+    print(__doc__)
@@ -0,0 +1,50 @@
+# batch_ingest.py
+
+"""
+Parallel fetching for the batch /add endpoints.
+URLs are fetched on a thread pool, but never more than a fixed number at once
+against the same host. Results come back in input order so callers can keep
+their sequential duplicate detection and write everything in one go.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+INGEST_MAX_WORKERS = int(os.environ.get("INGEST_MAX_WORKERS", 16))
+INGEST_PER_HOST = int(os.environ.get("INGEST_PER_HOST", 4))
+
+_host_semaphores = {}
+_host_lock = threading.Lock()
+
+
+def _host_semaphore(url, per_host, host_limits):
+    host = urlsplit(url).netloc.lower()
+    limit = (host_limits or {}).get(host, per_host)
+    with _host_lock:
+        key = (host, limit)
+        if key not in _host_semaphores:
+            _host_semaphores[key] = threading.BoundedSemaphore(limit)
+        return _host_semaphores[key]
+
+
+def ingest_batch(urls, fetch, per_host=None, host_limits=None, max_workers=None):
+    """
+    Calls fetch(url) for every url in parallel, with at most per_host calls in
+    flight per host (host_limits can override it for specific hosts).
+    Returns [(url, result, error)] in input order; error is the exception or None.
+    """
+    per_host = per_host or INGEST_PER_HOST
+    max_workers = max_workers or INGEST_MAX_WORKERS
+
+    def run(url):
+        with _host_semaphore(url, per_host, host_limits):
+            try:
+                return url, fetch(url), None
+            except Exception as e:
+                return url, None, e
+
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(run, urls))
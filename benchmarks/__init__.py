@@ -0,0 +1,6 @@
+# benchmarks/__init__.py
+
+"""
+Hot-path benchmarks. Run each from the repository root, e.g. python -m benchmarks.classify.
+python -m benchmarks.run is the full suite (fetch, parse, classify and endpoints) with JSON output.
+"""
@@ -0,0 +1,82 @@
+# benchmarks/classify.py
+
+"""
+Per-video cost of classify_video on the current library, against the previous
+implementation (keyword maps merged into a fresh dict and scanned in a Python
+loop on every call). Uses saved raw features where they exist and falls back to
+each video's title plus its stored tags otherwise. Also checks that both
+produce the same tags.
+
+    python -m benchmarks.classify [--repeat 5] [--file classified_videos.txt]
+"""
+import argparse
+import time
+
+from classification_logic import (ACTION_MAP, ATTRIBUTE_MAP, ETHNICITY_MAP, GENRE_MAP,
+                                  classify_many, determine_sexuality)
+from storage import FileStorage, VIDEO_FILE
+
+
+def legacy_classify_video(title, channel_name, scraped_tags, male_actors, female_actors, trans_actors):
+    primary_sexuality_tag = determine_sexuality(len(male_actors), len(female_actors), len(trans_actors),
+                                                title, channel_name, scraped_tags)
+    secondary_tags = set()
+    search_text = " ".join(scraped_tags) + " " + title.lower()
+    all_maps = {**GENRE_MAP, **ETHNICITY_MAP, **ATTRIBUTE_MAP, **ACTION_MAP}
+    for keyword, tag in all_maps.items():
+        if keyword in search_text:
+            secondary_tags.add(tag)
+    final_tags = [primary_sexuality_tag]
+    primary_base = primary_sexuality_tag.split(' ')[0]
+    for tag in sorted(list(secondary_tags)):
+        if tag.lower() not in primary_base.lower():
+            final_tags.append(tag)
+    return final_tags
+
+
+def load_corpus(video_file):
+    storage = FileStorage(video_file)
+    features = storage.load_features()
+    corpus = []
+    for record in storage.load_videos():
+        stored = features.get(record.link)
+        if stored:
+            corpus.append((stored["title"], stored["channel"], stored["tags"],
+                           stored["male_actors"], stored["female_actors"], stored["trans_actors"]))
+        else:
+            corpus.append((record.title, "Unknown Channel", [t.lower() for t in record.tags if t], [], [], []))
+    return corpus
+
+
+def time_per_video(classify, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = classify(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=VIDEO_FILE)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.file)
+    if not corpus:
+        print(f"No videos found in '{args.file}'.")
+        return
+
+    before, expected = time_per_video(lambda rows: [legacy_classify_video(*row) for row in rows], corpus, args.repeat)
+    after, actual = time_per_video(classify_many, corpus, args.repeat)
+
+    mismatches = sum(a != b for a, b in zip(expected, actual))
+    print(f"Corpus: {len(corpus)} videos from '{args.file}' (best of {args.repeat})")
+    print(f"  previous      : {before * 1e6:8.1f} us/video")
+    print(f"  classify_many : {after * 1e6:8.1f} us/video  ({before / after:.2f}x)")
+    print(f"  mismatched results: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
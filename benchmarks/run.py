@@ -0,0 +1,223 @@
+# benchmarks/run.py
+
+"""
+Benchmark suite for the fetch, parse, classify and serve hot paths.
+
+Fetch cases replay recorded fixtures (benchmarks/fixtures) from a local stub
+server, so they measure our client + parse cost, not the internet. Endpoint
+cases run against synthetic libraries of each --sizes entry in a scratch
+directory, through Flask's test client. Results go to a JSON file that can be
+compared between commits:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+
+Use --sizes 1000,100000 for a quick run; the default includes 1M rows, which
+takes a few GB of RAM and several minutes.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# The stub answers for every host, so nothing here should wait on real upstream quotas.
+os.environ.setdefault("RATE_LIMITS", "reddit.com=1000000:1000000,pornhub.com=1000000:1000000")
+
+from benchmarks.stub_server import FIXTURE_DIR, StubServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = "1000,100000,1000000"
+VIDEO_TAGS = ["Straight (M/F)", "Lesbian (F/F)", "Solo (Female)", "Threesome (FFM)", "Gay (M/M)"]
+SECONDARY_TAGS = ["POV", "MILF", "Teen", "Blonde", "Brunette", "Amateur", "HD", "Anal", "Big Tits", "Asian", "Ebony"]
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore".split()
+
+
+def measure(fn, repeat, budget):
+    """Calls fn once cold, then up to repeat more times within budget seconds. Returns stats in seconds."""
+    start = time.perf_counter()
+    result = fn()
+    first = time.perf_counter() - start
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (not samples or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "n": len(samples), "first": first, "min": samples[0], "median": statistics.median(samples),
+        "mean": statistics.fmean(samples), "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }, result
+
+
+# --- Synthetic libraries ---
+def video_records(size, rng, VideoRecord):
+    return [VideoRecord(f"Video {i} {' '.join(rng.sample(WORDS, 4))}",
+                        (rng.choice(VIDEO_TAGS), *sorted(rng.sample(SECONDARY_TAGS, 3))),
+                        f"https://www.pornhub.com/view_video.php?viewkey=ph{i:012x}")
+            for i in range(size)]
+
+
+def gallery_items(size, rng):
+    return [{"id": str(i), "media_url": f"https://img.example-booru.com/images/{i}.jpeg", "type": "image",
+             "tags": sorted({f"{rng.choice(WORDS)}_{rng.choice(WORDS)}" for _ in range(8)}),
+             "source_url": f"https://rule34.example/index.php?page=post&s=view&id={i}"}
+            for i in range(size)]
+
+
+def reddit_items(size, rng):
+    return [{"id": f"t{i:x}", "title": " ".join(rng.sample(WORDS, 5)), "author": f"user{rng.randrange(5000)}",
+             "subreddit": f"r/sub{rng.randrange(300)}", "media_url": f"https://i.redd.it/{i:x}.jpg",
+             "type": "image", "source_url": f"/r/sub/comments/{i:x}/"}
+            for i in range(size)]
+
+
+def load_library(size, seed):
+    """Writes a synthetic library of size rows per collection into the current storage."""
+    import videos
+    from storage import get_storage
+    from video_index import VideoRecord
+
+    rng = random.Random(seed)
+    storage = get_storage()
+    records = video_records(size, rng, VideoRecord)
+    storage.replace_videos(records)
+    with open(videos.CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump({r.link: f"https://ei.example-cdn.com/{i}.jpg" for i, r in enumerate(records)}, f)
+    videos.load_cache()  # Every video has a thumbnail, so no background resolution kicks in.
+    videos.VIDEO_INDEX.invalidate()
+    storage.replace_items("gallery", gallery_items(size, rng))
+    storage.replace_items("reddit", reddit_items(size, rng))
+
+
+# --- Cases ---
+def fetch_cases(stub):
+    import gallery
+    import reddit
+    import videos
+    from page_extract import parse_page
+
+    counter = iter(range(10 ** 9))  # Unique URLs, so the page cache never answers.
+    with open(os.path.join(FIXTURE_DIR, "video_page.html"), encoding="utf-8") as f:
+        video_html = f.read()
+    info = parse_page(video_html, stub.url("/view_video.php"))
+    return {
+        "fetch_video_details": lambda: videos.fetch_video_details(stub.url(f"/view_video.php?viewkey=b{next(counter)}")),
+        "scrape_page": lambda: gallery.scrape_page(stub.url(f"/index.php?page=post&s=view&id={next(counter)}")),
+        "scrape_reddit_post": lambda: reddit.scrape_reddit_post(stub.url(f"/r/pics/comments/{next(counter)}/x/")),
+        "scrape_reddit_post_imgur": lambda: reddit.scrape_reddit_post(stub.url(f"/r/imgur/comments/{next(counter)}/x/")),
+        "parse_page": lambda: parse_page(video_html, stub.url("/view_video.php")),
+        "classify_video": lambda: videos_classify(info),
+    }
+
+
+def videos_classify(info):
+    from classification_logic import classify_video
+    return classify_video(info.title, info.channel, info.tags, info.male_actors, info.female_actors, info.trans_actors)
+
+
+ENDPOINTS = [
+    ("GET /videos (full list)", "/videos"),
+    ("GET /videos page", "/videos?page=1&limit=50"),
+    ("GET /videos tag+search", "/videos?page=1&limit=50&tag=MILF&q=lorem"),
+    ("GET /gallery page", "/gallery/?page=1&limit=50"),
+    ("GET /gallery deep page", "/gallery/?page=1000&limit=50"),
+    ("GET /gallery deep cursor", "/gallery/?after={mid}&limit=50"),
+    ("GET /gallery search", "/gallery/?q=lorem_ipsum"),
+    ("GET /gallery/tags", "/gallery/tags"),
+    ("GET /reddit-gallery page", "/reddit-gallery/?page=1&limit=50"),
+    ("GET /reddit-gallery cursor", "/reddit-gallery/?after=t{mid:x}&limit=50"),
+    ("GET /reddit-gallery subreddit", "/reddit-gallery/?subreddit=r/sub7"),
+    ("GET /reddit-gallery/subreddits", "/reddit-gallery/subreddits"),
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (median, new/old):")
+    for r in results:
+        old = baseline.get((r["name"], r["size"]))
+        if old:
+            ratio = r["median"] / old["median"] if old["median"] else float("inf")
+            flag = "  <-- slower" if ratio > 1.1 else ""
+            print(f"  {r['name']:<34} {str(r['size'] or ''):>8}  {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated library sizes for endpoint cases")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case after the cold run")
+    parser.add_argument("--budget", type=float, default=10.0, help="max seconds of timed runs per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file from an earlier run")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    # The app keeps its data files in the working directory; give it a scratch one.
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    results = []
+
+    def record(name, size, stats, payload=None):
+        row = {"name": name, "size": size, **stats}
+        if payload is not None:
+            row["bytes"] = payload
+        results.append(row)
+        print(f"  {name:<34} {str(size or ''):>8}  median {stats['median'] * 1e3:10.3f} ms  "
+              f"p95 {stats['p95'] * 1e3:10.3f} ms  first {stats['first'] * 1e3:10.3f} ms  (n={stats['n']})")
+
+    try:
+        with StubServer() as stub:
+            print("Fetch / parse / classify:")
+            for name, fn in fetch_cases(stub).items():
+                record(name, None, measure(fn, args.repeat, args.budget)[0])
+
+        from app import app
+        client = app.test_client()
+        for size in sizes:
+            print(f"Endpoints at {size} rows:")
+            load_library(size, args.seed)
+            for name, path in ENDPOINTS:
+                path = path.format(mid=size // 2)  # Cursor cases start halfway down the list.
+                stats, response = measure(lambda: client.get(path), args.repeat, args.budget)
+                record(name, size, stats, len(response.data))
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "storage_backend": os.environ.get("STORAGE_BACKEND", "files"),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "sizes": sizes, "repeat": args.repeat,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nWrote {len(results)} results to {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
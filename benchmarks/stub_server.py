@@ -0,0 +1,68 @@
+# benchmarks/stub_server.py
+
+"""
+Local HTTP server that replays the recorded fixtures in benchmarks/fixtures.
+"{base}" in a fixture is replaced with the server's own URL, so links between
+fixtures (reddit post -> imgur page) stay on the stub.
+
+    with StubServer() as stub:
+        stub.url("/view_video.php?viewkey=ph1")
+"""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# path prefix -> (fixture file, content type); the first matching prefix wins.
+ROUTES = [
+    ("/view_video.php", "video_page.html", "text/html; charset=utf-8"),
+    ("/index.php", "rule34_post.html", "text/html; charset=utf-8"),
+    ("/r/imgur/", "reddit_imgur_post.json", "application/json"),
+    ("/r/", "reddit_post.json", "application/json"),
+    ("/imgur/", "imgur_page.html", "text/html; charset=utf-8"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real upstreams.
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        for prefix, fixture, content_type in ROUTES:
+            if self.path.startswith(prefix):
+                body = self.server.bodies[fixture]
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_error(404)
+
+
+class StubServer:
+    """Serves the fixtures on 127.0.0.1 from a background thread."""
+
+    def __init__(self, port=0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._server.bodies = {}
+        for _, fixture, _ in ROUTES:
+            with open(os.path.join(FIXTURE_DIR, fixture), "r", encoding="utf-8") as f:
+                self._server.bodies[fixture] = f.read().replace("{base}", self.base).encode("utf-8")
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+
+    def url(self, path):
+        return self.base + path
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
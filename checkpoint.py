@@ -0,0 +1,106 @@
+# checkpoint.py
+
+"""
+Checkpointing for long bulk jobs (reclassify, rebuild).
+Each finished link is appended to a checkpoint file as soon as it completes,
+so a crash, Ctrl-C or upstream block loses at most the in-flight links. A
+resumed run skips links already in the checkpoint. The final output goes
+through storage.replace_videos, which holds the video lock (or a SQLite
+write transaction) and keeps videos added or removed while the job ran;
+then the checkpoint is removed.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from storage import get_storage
+from video_index import parse_video_line
+
+
+def checkpoint_path(output_file, job):
+    return f"{output_file}.{job}.checkpoint"
+
+
+class Checkpoint:
+    """url -> result line log for one job, stored next to its output file."""
+
+    def __init__(self, output_file, job, resume=False):
+        self.output_file = output_file
+        self.path = checkpoint_path(output_file, job)
+        self.done = {}
+        self._lock = threading.Lock()
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    url, result = json.loads(line)
+                except (ValueError, TypeError):
+                    continue  # A torn last line from the interrupted run.
+                self.done[url] = result
+
+    def record(self, url, result):
+        """Durably marks url as done with its result line."""
+        with self._lock:
+            self.done[url] = result
+            self._file.write(json.dumps([url, result]) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def finish(self, lines, known_links):
+        """
+        Replaces the stored videos with lines ('title | tags | link') and drops
+        the checkpoint. known_links are the links stored when the job started;
+        videos added since then are kept and videos removed since then stay removed.
+        """
+        self.close()
+        records = [record for record in map(parse_video_line, lines) if record]
+        get_storage().replace_videos(records, known_links=known_links)
+        os.remove(self.path)
+
+
+def thread_runner(process, max_workers):
+    """Runner that maps process(url) over urls on a thread pool, yielding (url, result) as they complete."""
+    def run(urls):
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(process, url): url for url in urls}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # On Ctrl-C or an error, drop queued links instead of working through them.
+            executor.shutdown(wait=True, cancel_futures=True)
+    return run
+
+
+def run_checkpointed(urls, runner, checkpoint, is_done=lambda result: True):
+    """
+    Feeds every url not already in the checkpoint to runner (an iterable of
+    urls -> iterator of (url, result), see thread_runner), recording each
+    result as it completes. Results for which is_done() is false (failures)
+    are returned but not recorded, so a resumed run retries them. Yields
+    (url, result) in completion order.
+    """
+    pending = [url for url in dict.fromkeys(urls) if url not in checkpoint.done]
+    results = runner(pending)
+    try:
+        for url, result in results:
+            if result and is_done(result):
+                checkpoint.record(url, result)
+            yield url, result
+    finally:
+        results.close()
+        checkpoint.close()
@@ -0,0 +1,159 @@
+# classification_cache.py
+
+"""
+Persistent memo cache for classify_video.
+classify_video is pure, so its result is stored under a hash of its inputs
+(title, channel, tags, actors) and reused on re-ingest, reclassification and
+rebuilds. The file is stamped with classification_logic.RULES_VERSION; when
+the keyword maps or hierarchy code (scalar or batch_classify) change, the old
+entries are discarded and everything is recomputed once.
+
+The file is JSON lines: a {"rules_version": ...} header followed by
+[key, tags] records appended in batches.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import metrics
+from classification_logic import RULES_VERSION, classify_many
+from process_lock import ProcessLock
+
+CLASSIFICATION_CACHE_FILE = "classification_cache.jsonl"
+
+
+def _canonical(title, channel_name, scraped_tags, male_actors, female_actors, trans_actors):
+    # Sets have no stable order; sorting makes both the key and the result deterministic.
+    return (title, channel_name, sorted(scraped_tags), sorted(male_actors), sorted(female_actors), sorted(trans_actors))
+
+
+def feature_key(video):
+    """Hash of one canonicalized (title, channel, tags, males, females, trans) input."""
+    return hashlib.sha1(json.dumps(video, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """Feature-hash -> tags memo, invalidated as a whole when the rules version changes."""
+
+    def __init__(self, path=CLASSIFICATION_CACHE_FILE, rules_version=RULES_VERSION):
+        self.path = path
+        self.rules_version = rules_version
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+        self._buffer = []
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._process_lock = ProcessLock(path + ".lock")
+        os.register_at_fork(after_in_child=self._reset_lock)
+        atexit.register(self.flush)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return json.dumps({"rules_version": self.rules_version}) + "\n"
+
+    def load(self):
+        """Reads entries for the current rules version; a stale file is started over."""
+        data = {}
+        with self._process_lock:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    header = json.loads(f.readline() or "{}")
+                    if header.get("rules_version") == self.rules_version:
+                        for line in f:
+                            try:
+                                key, tags = json.loads(line)
+                            except (ValueError, TypeError):
+                                continue
+                            data[key] = tags
+                    else:
+                        logging.info(f"Classification rules changed; discarding cache '{self.path}'.")
+                        raise FileNotFoundError
+            except FileNotFoundError:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(self._header())
+        with self._lock:
+            self.data = data
+            self._loaded = True
+        return self
+
+    def classify_many(self, videos, classify=classify_many):
+        """
+        Memoized classification_logic.classify_many: only inputs not seen under
+        the current rules version are passed to classify (any function with
+        classify_many's signature, e.g. batch_classify.classify_corpus).
+        Results are in input order.
+        """
+        if not self._loaded:
+            self.load()
+        videos = [_canonical(*video) for video in videos]
+        keys = [feature_key(video) for video in videos]
+        with self._lock:
+            results = [self.data.get(key) for key in keys]
+        missing = [i for i, tags in enumerate(results) if tags is None]
+        if missing:
+            start = time.perf_counter()
+            computed = classify([videos[i] for i in missing])
+            metrics.CLASSIFY_SECONDS.observe(time.perf_counter() - start)
+            with self._lock:
+                for i, tags in zip(missing, computed):
+                    results[i] = tags
+                    if keys[i] not in self.data:
+                        self.data[keys[i]] = tags
+                        self._buffer.append([keys[i], tags])
+        with self._lock:
+            self.hits += len(videos) - len(missing)
+            self.misses += len(missing)
+        metrics.CLASSIFY_VIDEOS.inc(len(videos) - len(missing), "hit")
+        metrics.CLASSIFY_VIDEOS.inc(len(missing), "miss")
+        return results
+
+    def classify(self, title, channel_name, scraped_tags, male_actors, female_actors, trans_actors):
+        """Memoized classification_logic.classify_video."""
+        return self.classify_many([(title, channel_name, scraped_tags, male_actors, female_actors, trans_actors)])[0]
+
+    def flush(self):
+        """Appends entries computed since the last flush to the cache file."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        try:
+            with self._process_lock:
+                # Another process may have started a new rules version meanwhile; never mix versions.
+                with open(self.path, "r", encoding="utf-8") as f:
+                    current = json.loads(f.readline() or "{}").get("rules_version")
+                if current != self.rules_version:
+                    return
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error writing classification cache '{self.path}': {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_classification_cache():
+    """Process-wide cache instance, loaded on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ClassificationCache()
+        return _cache
+
+
+def _reset_after_fork():
+    global _cache_lock
+    _cache_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
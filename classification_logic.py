@@ -4,12 +4,18 @@
 Advanced, sexuality-first video classification logic.
 Now includes title and channel name analysis.
 """
+import hashlib
+import inspect
+import os
 # --- Keyword Maps (for secondary descriptive tags) ---
 GENRE_MAP = {'pov': 'POV', 'point of view': 'POV', 'public': 'Public', 'interview': 'Interview', 'reality': 'Reality', 'compilation': 'Compilation', 'behind the scenes': 'Behind the Scenes'}
 ETHNICITY_MAP = {'ebony': 'Ebony', 'black': 'Ebony', 'asian': 'Asian', 'latina': 'Latina', 'latino': 'Latina', 'indian': 'Indian'}
 ATTRIBUTE_MAP = {'teen': 'Teen', 'young': 'Teen', 'milf': 'MILF', 'mature': 'Mature', 'cougar': 'MILF', 'big tits': 'Big Tits', 'big boobs': 'Big Tits', 'small tits': 'Small Tits', 'big ass': 'Big Ass', 'bubble butt': 'Big Ass', 'blonde': 'Blonde', 'brunette': 'Brunette', 'redhead': 'Redhead', 'tattoo': 'Tattoo', 'hairy': 'Hairy', 'amateur': 'Amateur', 'homemade': 'Amateur', 'hd': 'HD', '4k': 'HD'}
 ACTION_MAP = {'anal': 'Anal', 'dp': 'DP', 'double penetration': 'DP', 'creampie': 'Creampie', 'deepthroat': 'Deepthroat', 'facial': 'Facial', 'bdsm': 'BDSM', 'bondage': 'BDSM', 'femdom': 'Femdom', 'fisting': 'Fisting', 'footjob': 'Foot Fetish', 'feet': 'Foot Fetish', 'handjob': 'Handjob', 'pegging': 'Pegging', 'rimjob': 'Rimjob', 'squirting': 'Squirting', 'tribbing': 'Tribbing', 'scissoring': 'Scissoring', 'pussy licking': 'Pussy Licking'}
 
+# Built once at import: (keyword, tag) pairs in map order, scanned with C-level substring tests.
+SECONDARY_KEYWORDS = tuple({**GENRE_MAP, **ETHNICITY_MAP, **ATTRIBUTE_MAP, **ACTION_MAP}.items())
+
 
 def determine_sexuality(male_count, female_count, trans_count, title, channel_name, tags):
     """
@@ -86,20 +92,50 @@ def classify_video(title, channel_name, scraped_tags, male_actors, female_actors
     trans_count = len(trans_actors)
 
     primary_sexuality_tag = determine_sexuality(male_count, female_count, trans_count, title, channel_name, scraped_tags)
-    
-    secondary_tags = set()
+    return finalize_tags(primary_sexuality_tag, title, scraped_tags)
+
+
+def finalize_tags(primary_sexuality_tag, title, scraped_tags):
+    """Adds the secondary descriptive tags after an already-determined primary sexuality tag."""
     search_text = " ".join(scraped_tags) + " " + title.lower()
-    all_maps = {**GENRE_MAP, **ETHNICITY_MAP, **ATTRIBUTE_MAP, **ACTION_MAP}
+    secondary_tags = {tag for keyword, tag in SECONDARY_KEYWORDS if keyword in search_text}
 
-    for keyword, tag in all_maps.items():
-        if keyword in search_text:
-            secondary_tags.add(tag)
-            
     final_tags = [primary_sexuality_tag]
     
-    primary_base = primary_sexuality_tag.split(' ')[0]
-    for tag in sorted(list(secondary_tags)):
-        if tag.lower() not in primary_base.lower():
+    primary_base = primary_sexuality_tag.split(' ')[0].lower()
+    for tag in sorted(secondary_tags):
+        if tag.lower() not in primary_base:
             final_tags.append(tag)
             
-    return final_tags
\ No newline at end of file
+    return final_tags
+
+
+def classify_many(videos):
+    """
+    Classifies a batch of (title, channel_name, scraped_tags, male_actors,
+    female_actors, trans_actors) tuples. Returns the tag lists in input order.
+    """
+    return [classify_video(*video) for video in videos]
+
+
+def feature_row(features):
+    """classify_video's argument tuple for a stored raw feature record (see storage.make_features)."""
+    return (features["title"], features["channel"], features["tags"],
+            features["male_actors"], features["female_actors"], features["trans_actors"])
+
+
+def _rules_version():
+    # Any edit to a keyword map or to the classification code yields a new version.
+    # batch_classify's vectorized rules (_hierarchy, TAG_BITS, the *_bits helpers) fill the
+    # same cache, so its whole source counts too; it is read as a file because it imports us.
+    digest = hashlib.sha1()
+    for keyword_map in (GENRE_MAP, ETHNICITY_MAP, ATTRIBUTE_MAP, ACTION_MAP):
+        digest.update(repr(sorted(keyword_map.items())).encode("utf-8"))
+    for function in (determine_sexuality, classify_video, finalize_tags):
+        digest.update(inspect.getsource(function).encode("utf-8"))
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_classify.py"), "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+RULES_VERSION = _rules_version()
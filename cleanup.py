@@ -4,13 +4,65 @@ import json
 import os
 import shutil
 
+from storage import COLLECTION_FILES, get_storage
+
 # --- Configuration ---
-# List of the JSON database files you want to clean.
+# Collections served by the app; these are read and written through storage so
+# that records still in an append log (or the SQLite backend) are included.
+COLLECTIONS_TO_CLEAN = [
+    "gallery"
+]
+# Plain JSON files owned by the scrapers.
 FILES_TO_CLEAN = [
-    "gallery_data.json",
     "reddit_gallery.json"
 ]
 
+def remove_duplicate_ids(data):
+    """Returns (unique_items, duplicates_found), keeping the first entry of each 'id'."""
+    unique_items = []
+    seen_ids = set()
+    duplicates_found = 0
+
+    for item in data:
+        # Ensure the item is a dictionary and has an 'id'
+        if isinstance(item, dict) and "id" in item:
+            item_id = item["id"]
+            if item_id not in seen_ids:
+                unique_items.append(item)
+                seen_ids.add(item_id)
+            else:
+                duplicates_found += 1
+        else:
+            # Keep items that don't have an ID (e.g., corrupted entries)
+            unique_items.append(item)
+    return unique_items, duplicates_found
+
+def clean_duplicates_from_collection(collection):
+    """
+    Loads a collection from storage, removes duplicate entries based on the
+    'id' field, and replaces the collection with the cleaned list.
+    """
+    print(f"--- Processing collection: {collection} ---")
+    storage = get_storage()
+    data = storage.load_items(collection)
+    unique_items, duplicates_found = remove_duplicate_ids(data)
+
+    if duplicates_found > 0:
+        print(f"Found and removed {duplicates_found} duplicate(s).")
+
+        # Back up the full collection as it was loaded
+        backup_filename = f"{COLLECTION_FILES[collection]}.bak"
+        print(f"Backing up original data to '{backup_filename}'...")
+        with open(backup_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+        print(f"Saving cleaned data back to the '{collection}' collection...")
+        storage.replace_items(collection, unique_items)
+
+        print("✅ Collection cleaned successfully.")
+    else:
+        print("✅ No duplicates found.")
+
 def clean_duplicates_from_file(filename):
     """
     Reads a JSON file, removes duplicate entries based on the 'id' field,
@@ -35,22 +87,7 @@ def clean_duplicates_from_file(filename):
         return
 
     # --- Find and remove duplicates ---
-    unique_items = []
-    seen_ids = set()
-    duplicates_found = 0
-
-    for item in data:
-        # Ensure the item is a dictionary and has an 'id'
-        if isinstance(item, dict) and "id" in item:
-            item_id = item["id"]
-            if item_id not in seen_ids:
-                unique_items.append(item)
-                seen_ids.add(item_id)
-            else:
-                duplicates_found += 1
-        else:
-            # Keep items that don't have an ID (e.g., corrupted entries)
-            unique_items.append(item)
+    unique_items, duplicates_found = remove_duplicate_ids(data)
     
     # --- Save the cleaned data if changes were made ---
     if duplicates_found > 0:
@@ -72,7 +109,10 @@ def clean_duplicates_from_file(filename):
 
 
 if __name__ == "__main__":
+    for collection in COLLECTIONS_TO_CLEAN:
+        clean_duplicates_from_collection(collection)
+        print("-" * 25)
     for file in FILES_TO_CLEAN:
         clean_duplicates_from_file(file)
         print("-" * 25)
-    print("All files have been processed.")
\ No newline at end of file
+    print("All collections and files have been processed.")
\ No newline at end of file
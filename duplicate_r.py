@@ -3,6 +3,11 @@ import sys
 import shutil
 from datetime import datetime
 
+from storage import get_storage
+
+# The raw scraper output is cleaned into the app's reddit collection.
+COLLECTION = "reddit"
+
 def find_duplicates(posts_data):
     """
     Identifies posts with the same title, media_url, and subreddit.
@@ -74,14 +79,17 @@ if __name__ == "__main__":
             except Exception as e:
                 print(f"\n⚠️ Warning: Could not create backup file. Error: {e}")
 
-            # --- Remove duplicates and save the new file ---
-            cleaned_data = remove_duplicates(data)
-            output_filename = 'cleaned_data.json'
-            
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_data, f, indent=4, ensure_ascii=False)
-            
-            print(f"✨ Duplicates removed. Clean data saved to '{output_filename}'.")
-            print(f"Original post count: {len(data)}. New post count: {len(cleaned_data)}.")
+            # --- Remove duplicates and save them to the reddit collection ---
+            # Posts added through the app are only in the collection (possibly
+            # still in its append log), so they are read through storage and kept.
+            storage = get_storage()
+            raw_ids = {str(post.get('id')) for post in data}
+            added_in_app = [post for post in storage.load_items(COLLECTION) if str(post.get('id')) not in raw_ids]
+            cleaned_data = remove_duplicates(added_in_app + data)
+            storage.replace_items(COLLECTION, cleaned_data)
+
+            print(f"✨ Duplicates removed. Clean data saved to the '{COLLECTION}' collection.")
+            print(f"Original post count: {len(data)}. Kept {len(added_in_app)} post(s) added in the app. "
+                  f"New post count: {len(cleaned_data)}.")
         else:
             print("\n👍 No changes made. Exiting.")
\ No newline at end of file
@@ -1,34 +1,39 @@
 # gallery.py - MODIFIED
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 import requests
 from bs4 import BeautifulSoup
-import json
-import os
 import re
+import time
+
+import http_client
+import metrics
+from batch_ingest import ingest_batch
+from item_index import ItemIndex
+from storage import get_storage
 
 # 1. Create a Blueprint object with a URL prefix
 gallery_bp = Blueprint('gallery', __name__, url_prefix='/gallery')
 
-DATA_FILE = "gallery_data.json"
+COLLECTION = "gallery"
+STORAGE = get_storage()
+GALLERY_INDEX = ItemIndex(STORAGE, COLLECTION,
+                          facets={"tags": lambda item: [tag for tag in item.get("tags", []) if tag]},
+                          lookups={"source_url": lambda item: item.get("source_url")})
 
-# --- ALL HELPER FUNCTIONS (load_data, save_data, scrape_page) REMAIN EXACTLY THE SAME ---
+# --- HELPER FUNCTIONS ---
+# load_data/save_data go through the configured storage backend (see storage.py).
 def load_data():
-    if not os.path.exists(DATA_FILE): return []
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError): return []
+    return STORAGE.load_items(COLLECTION)
 
 def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    STORAGE.replace_items(COLLECTION, data)
 
 def scrape_page(url):
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(url, timeout=15)
         response.raise_for_status()
+        start = time.perf_counter()
         soup = BeautifulSoup(response.text, "html.parser")
         media_url, media_type = None, "image"
         video_element = soup.select_one("#gelcomVideoPlayer > source")
@@ -50,6 +55,7 @@ def scrape_page(url):
                     tag_text = second_link.text.strip()
                     if tag_text:
                         tags.append(tag_text.replace(" ", "_"))
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - start, "rule34_post")
         post_id_match = re.search(r"id=(\d+)", url)
         if not post_id_match: return None, "URL does not contain a valid post ID."
         return {
@@ -64,49 +70,58 @@ def scrape_page(url):
 # The final URL for this route will be /gallery/tags
 @gallery_bp.route("/tags", methods=["GET"])
 def get_all_tags():
-    all_items = load_data()
-    all_tags = set()
-    for item in all_items:
-        for tag in item.get("tags", []):
-            all_tags.add(tag)
-    return jsonify(sorted(list(all_tags)))
+    """
+    Every tag, sorted; ?counts=1 returns {"name", "count"} objects instead.
+    ?prefix= autocompletes (case-insensitive, up to ?limit= entries).
+    Served from the index's tag aggregate; the full list carries an ETag.
+    """
+    with_counts = request.args.get("counts", "") in ("1", "true")
+    prefix = request.args.get("prefix", "")
+    if prefix:
+        matches = GALLERY_INDEX.facet("tags", prefix, request.args.get("limit", type=int))
+        return jsonify([{"name": tag, "count": count} for tag, count in matches] if with_counts
+                       else [tag for tag, _ in matches])
+    body, etag = GALLERY_INDEX.facet_json("tags", with_counts)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Revalidate every time; unchanged lists come back as 304.
+    return response.make_conditional(request)
 
 # The final URL for this will be /gallery
 @gallery_bp.route("/", methods=["GET"])
 def get_gallery():
-    all_items = load_data()
-    search_query = request.args.get('q', '').lower().strip()
-    if search_query:
-        query_tags = search_query.split(' ')
-        filtered_items = []
-        for item in all_items:
-            item_tags_lower = {tag.lower() for tag in item.get('tags', [])}
-            if all(any(qt in it for it in item_tags_lower) for qt in query_tags):
-                filtered_items.append(item)
-        all_items = filtered_items
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 50, type=int)
-    start = (page - 1) * limit
-    end = start + limit
-    paginated_items = all_items[start:end]
+    # Every search term must be a substring of some tag; answered from the in-memory tag index.
+    # ?after=<id> (the previous response's "next") pages by cursor; ?page= offsets still work.
+    search_query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = max(request.args.get('limit', 50, type=int), 0)
+    after = request.args.get('after') or None
+    try:
+        paginated_items, total, next_cursor = GALLERY_INDEX.query(search_query, (page - 1) * limit, limit, after)
+    except KeyError:
+        return jsonify({"error": "Unknown cursor; start again without 'after'."}), 400
     return jsonify({
-        "items": paginated_items, "total": len(all_items),
-        "page": page, "limit": limit
+        "items": paginated_items, "total": total,
+        "page": page, "limit": limit, "next": next_cursor
     })
 
 @gallery_bp.route("/", methods=["POST"])
 def add_to_gallery():
     urls = request.json.get("urls")
     if not urls or not isinstance(urls, list): return jsonify({"error": "A list of URLs is required."}), 400
-    gallery_data = load_data()
-    existing_source_urls = {item['source_url'] for item in gallery_data}
+    existing_source_urls = {url for url in urls if GALLERY_INDEX.contains("source_url", url)}
+    # Scrape all new URLs in parallel (capped per host); results are handled in input order.
+    to_scrape = list(dict.fromkeys(url for url in urls if url not in existing_source_urls))
+    scraped = {url: (result, exc) for url, result, exc in ingest_batch(to_scrape, scrape_page)}
     results, new_items = [], []
     for url in urls:
         if url in existing_source_urls:
             results.append({"status": "duplicate", "url": url})
             continue
         try:
-            new_item, error = scrape_page(url)
+            result, exc = scraped[url]
+            if exc: raise exc
+            new_item, error = result
             if error: raise Exception(error)
             new_items.append(new_item)
             existing_source_urls.add(url)
@@ -114,17 +129,14 @@ def add_to_gallery():
         except Exception as e:
             results.append({"status": "error", "url": url, "reason": str(e)})
     if new_items:
-        save_data(new_items + gallery_data)
+        GALLERY_INDEX.add(new_items)
     return jsonify(results), 201
 
 @gallery_bp.route("/", methods=["DELETE"])
 def remove_from_gallery():
     item_id = request.json.get("id")
     if not item_id: return jsonify({"error": "Item ID is missing."}), 400
-    gallery_data = load_data()
-    updated_data = [item for item in gallery_data if item.get("id") != item_id]
-    if len(updated_data) == len(gallery_data): return jsonify({"error": "Item not found."}), 404
-    save_data(updated_data)
+    if not GALLERY_INDEX.remove(item_id): return jsonify({"error": "Item not found."}), 404
     return jsonify({"message": "Item removed successfully."}), 200
 
 # 3. REMOVE the original app definition and the __main__ block
\ No newline at end of file
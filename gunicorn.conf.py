@@ -0,0 +1,21 @@
+# gunicorn.conf.py - picked up automatically by `gunicorn app:app` (see Procfile.txt)
+
+import gc
+import multiprocessing
+import os
+
+# Import the app once in the master so the thumbnail cache and video index are
+# loaded before forking; workers then share those pages copy-on-write.
+preload_app = True
+
+# Only one worker runs the background thumbnail resolver (it holds a claim file),
+# so adding workers does not multiply upstream thumbnail fetches.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = 60
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collection in the workers does not touch (and copy) the shared pages.
+    gc.freeze()
@@ -0,0 +1,108 @@
+# http_client.py
+
+"""
+Shared HTTP client for every scraper and blueprint.
+One requests.Session with per-host connection pools and keep-alive, so
+repeated fetches from the same site reuse TCP+TLS connections. Also keeps
+per-host request counts and latency histograms (see get_stats()).
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Sized for the thread pools in use (thumbnail resolver, batch ingest, bulk tools).
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_HOSTS", 16))   # Hosts kept in the pool cache.
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 32))     # Connections kept per host.
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 15))
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+DEFAULT_HEADERS = {"User-Agent": os.environ.get("HTTP_USER_AGENT", BROWSER_USER_AGENT)}
+SEARCH_REFERER = {"Referer": "https://www.google.com"}
+REDDIT_HEADERS = {"User-Agent": "MyGallery/1.0"}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def _reset_after_fork():
+    # Pooled sockets must not be shared with a forked child.
+    global _session, _session_lock, _stats_lock
+    _session = None
+    _session_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def record_request(host, elapsed, failed):
+    """Adds one request to the per-host stats (also used by the async fetch engine)."""
+    with _stats_lock:
+        host_stats = _stats.get(host)
+        if host_stats is None:
+            host_stats = _stats[host] = {
+                "requests": 0, "errors": 0, "latency_sum": 0.0,
+                "latency_buckets": [0] * len(LATENCY_BUCKETS),
+            }
+        host_stats["requests"] += 1
+        host_stats["errors"] += failed
+        host_stats["latency_sum"] += elapsed
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                host_stats["latency_buckets"][i] += 1
+                break
+
+
+def request(method, url, headers=None, timeout=None, **kwargs):
+    """Sends a request through the shared session; headers are merged over the defaults."""
+    host = urlsplit(url).netloc.lower()
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = get_session().request(method, url, headers=headers, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+        failed = response.status_code >= 400
+        return response
+    finally:
+        record_request(host, time.perf_counter() - start, failed)
+
+
+def get(url, headers=None, timeout=None, **kwargs):
+    return request("GET", url, headers=headers, timeout=timeout, **kwargs)
+
+
+def get_stats():
+    """Returns {host: {requests, errors, latency_sum, latency_buckets: {bound: count}}}."""
+    with _stats_lock:
+        return {
+            host: {
+                "requests": s["requests"], "errors": s["errors"], "latency_sum": s["latency_sum"],
+                "latency_buckets": dict(zip(LATENCY_BUCKETS, s["latency_buckets"])),
+            }
+            for host, s in _stats.items()
+        }
@@ -0,0 +1,306 @@
+# item_index.py
+
+"""
+Process-wide, in-memory search index for a gallery-style collection.
+Items get an ascending document number in age order, and each lowercased tag
+maps to the ascending list of documents carrying it. Substring search terms
+are first resolved against the distinct tag vocabulary through a trigram
+index (gram -> tags containing it), so a query only touches the tags it can
+match and then intersects their posting lists, instead of scanning every tag
+of every item.
+
+Facets are materialized aggregates (e.g. tag -> item count) kept up to date
+by the same insert/delete path. Each keeps its keys in a case-insensitively
+sorted list for prefix lookups by bisection, and the serialized full listing
+is cached with an ETag until the facet changes. Lookups are plain
+key -> live item count maps (e.g. source_url) for duplicate checks on add.
+
+Like VideoIndex, the collection is reloaded whenever the storage change stamp
+moves (another process wrote to it). Writes made through add()/remove() are
+applied to the index in place and do not trigger a reload, unless storage
+reports that another write landed since the index last loaded.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+GRAM = 3
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class ItemIndex:
+    """Tag postings plus a trigram index over the tag vocabulary for one collection."""
+
+    def __init__(self, storage, collection, facets=None, lookups=None):
+        self.storage = storage
+        self.collection = collection
+        self.facets = facets or {}  # name -> function(item) returning the item's keys
+        self.lookups = lookups or {}  # name -> function(item) returning one key or None
+        self.version = 0
+        self._stamp = None
+        self._lock = threading.RLock()
+        self._clear()
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.RLock()
+
+    def _clear(self):
+        self._docs = {}      # docno -> item, ascending (oldest first)
+        self._order = []     # live docnos, ascending; cursor pages are slices of it
+        self._by_id = {}     # str(item id) -> docno
+        self._removed = {}   # str(item id) -> docno of items removed since the load, so their cursors still work
+        self._postings = {}  # lowercased tag -> ascending [docno]
+        self._grams = {}     # trigram -> {lowercased tag}
+        self._next_doc = 0
+        self._facet_counts = {name: {} for name in self.facets}  # name -> {key: item count}
+        self._facet_sorted = {name: [] for name in self.facets}  # name -> sorted [(key.lower(), key)]
+        self._facet_json = {}  # name -> {with_counts: (body, etag)} of the full listing
+        self._lookup_counts = {name: {} for name in self.lookups}  # name -> {key: live item count}
+        self._bulk = False  # While loading, sorted key lists are built once at the end.
+
+    # --- Maintenance ---
+    def _insert(self, item):
+        item_id = str(item.get("id"))
+        if item_id in self._by_id:
+            return  # Storage keeps the first copy of an id (the SQLite backend ignores duplicates).
+        doc = self._next_doc
+        self._next_doc += 1
+        self._docs[doc] = item
+        self._order.append(doc)
+        self._by_id[item_id] = doc
+        for tag in {tag.lower() for tag in item.get("tags", []) if tag}:
+            posting = self._postings.get(tag)
+            if posting is None:
+                posting = self._postings[tag] = []
+                for gram in _grams(tag):
+                    self._grams.setdefault(gram, set()).add(tag)
+            posting.append(doc)
+        for name, keys_of in self.facets.items():
+            counts = self._facet_counts[name]
+            for key in set(keys_of(item)):
+                if key in counts:
+                    counts[key] += 1
+                else:
+                    counts[key] = 1
+                    if not self._bulk:
+                        insort(self._facet_sorted[name], (key.lower(), key))
+            self._facet_json.pop(name, None)
+        for name, key_of in self.lookups.items():
+            key = key_of(item)
+            if key is not None:
+                counts = self._lookup_counts[name]
+                counts[key] = counts.get(key, 0) + 1
+
+    def _delete(self, item_id):
+        doc = self._by_id.pop(str(item_id), None)
+        if doc is None:
+            return
+        item = self._docs.pop(doc)
+        del self._order[bisect_left(self._order, doc)]
+        self._removed[str(item_id)] = doc
+        for tag in {tag.lower() for tag in item.get("tags", []) if tag}:
+            posting = self._postings[tag]
+            posting.remove(doc)
+            if not posting:
+                del self._postings[tag]
+                for gram in _grams(tag):
+                    tags = self._grams[gram]
+                    tags.discard(tag)
+                    if not tags:
+                        del self._grams[gram]
+        for name, keys_of in self.facets.items():
+            counts = self._facet_counts[name]
+            for key in set(keys_of(item)):
+                counts[key] -= 1
+                if not counts[key]:
+                    del counts[key]
+                    keys = self._facet_sorted[name]
+                    del keys[bisect_left(keys, (key.lower(), key))]
+            self._facet_json.pop(name, None)
+        for name, key_of in self.lookups.items():
+            key = key_of(item)
+            if key is not None:
+                counts = self._lookup_counts[name]
+                counts[key] -= 1
+                if not counts[key]:
+                    del counts[key]
+
+    def _load(self, stamp):
+        try:
+            items = self.storage.load_items(self.collection)
+        except Exception as e:
+            logging.error(f"Could not load {self.collection} items: {e}")
+            items = []
+        self._clear()
+        self._bulk = True
+        for item in reversed(items):  # Stored newest first.
+            self._insert(item)
+        self._bulk = False
+        for name, counts in self._facet_counts.items():
+            self._facet_sorted[name] = sorted((key.lower(), key) for key in counts)
+        self._stamp = stamp
+        self.version += 1
+        logging.info(f"{self.collection} index loaded {len(self._docs)} items (version {self.version}).")
+
+    def refresh(self):
+        """Reloads the collection only if the storage changed since the last load."""
+        stamp = self.storage.items_stamp(self.collection)
+        if stamp is not None and stamp == self._stamp:
+            return
+        with self._lock:
+            stamp = self.storage.items_stamp(self.collection)
+            if stamp is None or stamp != self._stamp:
+                self._load(stamp)
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = None
+
+    def _own_write(self, stamps):
+        # stamps is the (before, after) pair of our write, taken by storage under its lock
+        # or transaction. Unless before is the stamp we loaded, another process wrote in
+        # between and only a reload picks that up.
+        if self._stamp is None or stamps[0] != self._stamp:
+            self._stamp = None
+            return False
+        self._stamp = stamps[1]
+        self.version += 1
+        return True
+
+    def add(self, items):
+        """Stores new items (newest first) and indexes them without a reload."""
+        items = list(items)
+        with self._lock:
+            self.refresh()  # The in-place update below assumes the index matches storage right now.
+            if self._own_write(self.storage.add_items(self.collection, items)):
+                for item in reversed(items):
+                    self._insert(item)
+
+    def remove(self, item_id):
+        """Removes an item from storage and the index. Returns False if it was not found."""
+        with self._lock:
+            self.refresh()
+            stamps = self.storage.remove_item(self.collection, item_id)
+            if not stamps:
+                return False
+            if self._own_write(stamps):
+                self._delete(item_id)
+            return True
+
+    # --- Queries ---
+    def _tags_containing(self, term):
+        if len(term) < GRAM:
+            return [tag for tag in self._postings if term in tag]
+        candidates = sorted((self._grams.get(gram, ()) for gram in _grams(term)), key=len)
+        if not candidates[0]:
+            return []
+        return [tag for tag in candidates[0] if term in tag]
+
+    def _matching_docs(self, terms):
+        doc_sets = []
+        for term in terms:
+            docs = set()
+            for tag in self._tags_containing(term):
+                docs.update(self._postings[tag])
+            if not docs:
+                return set()
+            doc_sets.append(docs)
+        doc_sets.sort(key=len)
+        return doc_sets[0].intersection(*doc_sets[1:])
+
+    def query(self, search_query="", start=0, limit=50, after=None, predicate=None):
+        """
+        Returns (items, total, next_cursor) for one page, newest first. Every
+        whitespace-separated term must be a substring of one of the item's tags
+        (case-insensitive), and predicate(item) must hold if given.
+
+        With after (an item id, normally a previous next_cursor) the page starts
+        just below that item and start is ignored; an unfiltered cursor page is a
+        bisect plus a slice of the insertion order, so it costs O(limit) however
+        deep it is. next_cursor is None on the last page. Raises KeyError for an
+        unknown cursor.
+        """
+        self.refresh()
+        terms = list(dict.fromkeys(search_query.lower().split()))
+        with self._lock:
+            before = None
+            if after is not None:
+                before = self._by_id.get(str(after), self._removed.get(str(after)))
+                if before is None:
+                    raise KeyError(after)
+                start = 0
+            if not terms and predicate is None:
+                order = self._order
+                total = len(order)
+                end = (total if before is None else bisect_left(order, before)) - start
+                docs = order[max(end - limit, 0):max(end, 0)][::-1]
+                more = end - limit > 0
+            else:
+                matches = self._matching_docs(terms) if terms else self._order
+                if predicate is not None:
+                    matches = [doc for doc in matches if predicate(self._docs[doc])]
+                total = len(matches)
+                if before is not None:
+                    matches = [doc for doc in matches if doc < before]
+                docs = heapq.nlargest(start + limit + 1, matches)[start:]
+                more = len(docs) > limit
+                docs = docs[:limit]
+            items = [self._docs[doc] for doc in docs]
+            next_cursor = items[-1].get("id") if more and items else None
+            return items, total, next_cursor
+
+    def has_id(self, item_id):
+        self.refresh()
+        with self._lock:
+            return str(item_id) in self._by_id
+
+    def contains(self, name, key):
+        """True if a live item has key under the named lookup (e.g. a source_url)."""
+        self.refresh()
+        with self._lock:
+            return key in self._lookup_counts[name]
+
+    def facet(self, name, prefix="", limit=None):
+        """
+        Returns [(key, count)] for keys starting with prefix (case-insensitive),
+        in case-insensitive order, answered by bisecting the sorted key list.
+        """
+        self.refresh()
+        prefix = prefix.lower()
+        with self._lock:
+            keys, counts = self._facet_sorted[name], self._facet_counts[name]
+            result = []
+            for lowered, key in islice(keys, bisect_left(keys, (prefix,)), None):
+                if not lowered.startswith(prefix) or len(result) == limit:
+                    break
+                result.append((key, counts[key]))
+            return result
+
+    def facet_json(self, name, with_counts=False):
+        """
+        Returns (body, etag) for the whole facet sorted by key: a JSON list of
+        keys, or of {"name", "count"} objects. Cached until the facet changes.
+        """
+        self.refresh()
+        with self._lock:
+            cached = self._facet_json.get(name, {}).get(with_counts)
+            if cached:
+                return cached
+            counts = self._facet_counts[name]
+            if with_counts:
+                payload = [{"name": key, "count": counts[key]} for key in sorted(counts)]
+            else:
+                payload = sorted(counts)
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            entry = (body, hashlib.sha1(body).hexdigest())
+            self._facet_json.setdefault(name, {})[with_counts] = entry
+            return entry
@@ -1,43 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
 import time
-import re
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-    "Referer": "https://www.google.com"
-}
+from page_extract import extract_page
+
+# get_video_title and get_video_tags share one download through extract_page's page cache.
 
 def get_video_title(url):
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        if response.status_code != 200:
-            print(f"Failed to access {url} (status {response.status_code})")
-            return None
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        title_tag = soup.find("title")
-        if title_tag:
-            return title_tag.text.strip().replace(" - Pornhub.com", "").strip()
-        return None
+        info = extract_page(url, timeout=10)
     except Exception as e:
         print(f"Error fetching title for {url}: {e}")
         return None
+    return info.title if info.title != "Untitled" else None
 
 def get_video_tags(url):
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        if response.status_code != 200:
-            return []
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        tag_elements = soup.find_all("a", href=re.compile(r"/video/search\?search="))
-        tags = [tag.text.strip().lower() for tag in tag_elements]
-        return tags
-
+        info = extract_page(url, timeout=10)
     except Exception as e:
         print(f"Error fetching tags for {url}: {e}")
         return []
+    return list(info.search_tags)
 
 def classify(tags):
     if "lesbian" in tags:
@@ -0,0 +1,195 @@
+# metrics.py
+
+"""
+In-process metrics with a Prometheus text-format /metrics endpoint.
+Instruments are plain counters and fixed-bucket histograms behind one short
+lock each; an observation is a bisect and three additions, so they are cheap
+enough for the request path. Upstream HTTP stats and rate-limiter waits are
+not recorded twice: they are read from http_client and rate_limiter when
+/metrics is scraped.
+
+Metrics are per process: under gunicorn each worker serves its own numbers
+(app_process_id tells them apart).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+import http_client
+import rate_limiter
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+WORK_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._reset_lock()
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in values]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram per label set (bucket counts are cumulative only when rendered)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in values:
+            lines.extend(_histogram_lines(self.name, self.labelnames, labels, self.buckets, counts, total))
+        return lines
+
+
+def _histogram_lines(name, labelnames, labels, bounds, counts, total):
+    lines, cumulative = [], 0
+    for bound, count in zip((*bounds, float("inf")), counts):
+        cumulative += count
+        le = 'le="' + _number(bound) + '"'
+        lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(total)}")
+    lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+    return lines
+
+
+# --- INSTRUMENTS ---
+REQUEST_SECONDS = Histogram("app_request_duration_seconds", "Time spent handling a request.",
+                            ("endpoint", "method", "status"))
+RESPONSE_BYTES = Histogram("app_response_size_bytes", "Response body size.",
+                           ("endpoint", "method"), SIZE_BUCKETS)
+PARSE_SECONDS = Histogram("app_parse_duration_seconds", "Time spent parsing a fetched page.",
+                          ("kind",), WORK_BUCKETS)
+CLASSIFY_SECONDS = Histogram("app_classify_duration_seconds",
+                             "Time spent classifying one batch of cache misses.", (), WORK_BUCKETS)
+CLASSIFY_VIDEOS = Counter("app_classified_videos_total", "Videos classified, by classification cache result.",
+                          ("result",))
+THUMBNAIL_LOOKUPS = Counter("app_thumbnail_cache_lookups_total", "Thumbnail cache lookups.", ("result",))
+
+INSTRUMENTS = [REQUEST_SECONDS, RESPONSE_BYTES, PARSE_SECONDS, CLASSIFY_SECONDS, CLASSIFY_VIDEOS, THUMBNAIL_LOOKUPS]
+
+
+def _upstream_lines():
+    stats = http_client.get_stats()
+    name = "app_upstream_request_duration_seconds"
+    lines = [f"# HELP {name} Outgoing HTTP request latency by host.", f"# TYPE {name} histogram"]
+    for host, s in stats.items():
+        bounds = tuple(bound for bound in s["latency_buckets"] if bound != float("inf"))
+        lines.extend(_histogram_lines(name, ("host",), (host,), bounds, list(s["latency_buckets"].values()),
+                                      s["latency_sum"]))
+    lines += ["# HELP app_upstream_errors_total Outgoing HTTP requests that failed or returned >= 400.",
+              "# TYPE app_upstream_errors_total counter"]
+    lines.extend(f'app_upstream_errors_total{{host="{_escape(host)}"}} {s["errors"]}' for host, s in stats.items())
+    return lines
+
+
+def _rate_limiter_lines():
+    stats = rate_limiter.get_stats()
+    lines = ["# HELP app_rate_limiter_wait_seconds_total Time callers were told to wait for a token.",
+             "# TYPE app_rate_limiter_wait_seconds_total counter"]
+    lines.extend(f'app_rate_limiter_wait_seconds_total{{host="{_escape(host)}"}} {_number(s["waited"])}'
+                 for host, s in stats.items())
+    lines += ["# HELP app_rate_limiter_rate Current allowed requests per second.",
+              "# TYPE app_rate_limiter_rate gauge"]
+    lines.extend(f'app_rate_limiter_rate{{host="{_escape(host)}"}} {_number(float(s["rate"]))}'
+                 for host, s in stats.items())
+    return lines
+
+
+def render():
+    """Returns every metric in Prometheus text exposition format."""
+    lines = []
+    for instrument in INSTRUMENTS:
+        lines.extend(instrument.render())
+    lines.extend(_upstream_lines())
+    lines.extend(_rate_limiter_lines())
+    pid = os.getpid()
+    lines += ["# HELP app_process_id Process id of the worker serving these metrics.",
+              "# TYPE app_process_id gauge", f"app_process_id {pid}"]
+    return "\n".join(lines) + "\n"
+
+
+# --- FLASK WIRING ---
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, request.method, str(response.status_code))
+    if response.content_length is not None:  # Streamed bodies have no known size.
+        RESPONSE_BYTES.observe(response.content_length, endpoint, request.method)
+    return response
+
+
+def init_app(app):
+    """Records request latency and size for every route and serves /metrics."""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule("/metrics", "metrics", lambda: Response(render(), content_type=CONTENT_TYPE))
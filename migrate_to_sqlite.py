@@ -0,0 +1,64 @@
+# migrate_to_sqlite.py
+
+"""
+One-shot importer from the flat files into the SQLite storage backend.
+Run it once, then start the app with STORAGE_BACKEND=sqlite.
+"""
+import argparse
+import os
+
+from storage import COLLECTION_FILES, DATABASE_FILE, FEATURES_FILE, VIDEO_FILE, FileStorage, SQLiteStorage
+
+# reddit_gallery.json is the raw scraper output; cleaned_data.json is its de-duplicated copy.
+REDDIT_FALLBACK_FILE = "reddit_gallery.json"
+
+
+def dedupe_by_id(items):
+    seen_ids, unique_items = set(), []
+    for item in items:
+        item_id = item.get("id")
+        if item_id in seen_ids:
+            continue
+        seen_ids.add(item_id)
+        unique_items.append(item)
+    return unique_items
+
+
+def migrate(database=DATABASE_FILE, force=False):
+    if os.path.exists(database) and not force:
+        print(f"Error: '{database}' already exists. Use --force to import into it anyway.")
+        return
+
+    collection_files = dict(COLLECTION_FILES)
+    if not os.path.exists(collection_files["reddit"]) and os.path.exists(REDDIT_FALLBACK_FILE):
+        collection_files["reddit"] = REDDIT_FALLBACK_FILE
+
+    source = FileStorage(VIDEO_FILE, collection_files, FEATURES_FILE)
+    target = SQLiteStorage(database)
+
+    videos = source.load_videos()
+    print(f"Importing {len(videos)} videos from '{VIDEO_FILE}'...")
+    target.append_videos(videos)
+
+    features = list(source.load_features().values())
+    print(f"Importing raw features for {len(features)} videos from '{FEATURES_FILE}'...")
+    target.save_features(features)
+
+    for collection, path in collection_files.items():
+        items = dedupe_by_id(source.load_items(collection))
+        print(f"Importing {len(items)} {collection} items from '{path}'...")
+        target.add_items(collection, items)
+
+    conn = target._connect()
+    for table in ("videos", "video_features", "items"):
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        print(f"  - {table}: {count} rows")
+    print(f"\n✅ Migration complete. Start the app with STORAGE_BACKEND=sqlite to use '{database}'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database", default=DATABASE_FILE, help="SQLite file to create.")
+    parser.add_argument("--force", action="store_true", help="Import even if the database already exists.")
+    args = parser.parse_args()
+    migrate(args.database, args.force)
@@ -0,0 +1,177 @@
+# page_extract.py
+
+"""
+Single-fetch extraction of a video page.
+One download and one parse yield everything the app needs from a watch page:
+title, channel, actors, tags, final/canonical URL and og:image. Results are
+kept in a short-TTL cache keyed by URL so every consumer (metadata, thumbnail,
+classification) shares the same response.
+
+fetch_og_image() is the cheap path for thumbnails alone: it streams the page,
+scans tags as they arrive and hangs up once the <head> is done.
+"""
+import codecs
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+import http_client
+import metrics
+
+PAGE_CACHE_TTL = 300  # seconds
+PAGE_CACHE_SIZE = 512
+HEAD_SCAN_CHUNK = 8192
+HEAD_SCAN_LIMIT = 512 * 1024  # Give up if no </head> shows up within this many bytes.
+
+PageInfo = namedtuple("PageInfo", [
+    "title", "channel", "tags", "male_actors", "female_actors", "trans_actors",
+    "final_url", "canonical_url", "og_image", "search_tags",
+])
+
+TAG_HREF = re.compile(r"/video/search\?search=|/tag/")
+SEARCH_HREF = re.compile(r"/video/search\?search=")
+PORNSTAR_HREF = re.compile(r'/pornstar/')
+
+_cache = OrderedDict()  # url -> (expires_at, PageInfo)
+_cache_lock = threading.Lock()
+
+
+def parse_page(html, final_url):
+    """Extracts a PageInfo from already-downloaded page HTML."""
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, "html.parser")
+
+    title_tag = soup.find("title")
+    title = "Untitled"
+    if title_tag:
+        title = title_tag.text.strip().replace(" - Pornhub.com", "").strip()
+
+    channel_name = "Unknown Channel"
+    channel_link = soup.select_one('a[data-mx-cat="Uploader"]')
+    if channel_link:
+        channel_name = channel_link.text.strip()
+
+    male_actors, female_actors, trans_actors = set(), set(), set()
+    actor_wrapper = soup.select_one("div.pornstarsWrapper")
+    if actor_wrapper:
+        for link in actor_wrapper.find_all('a', href=PORNSTAR_HREF):
+            actor_name = link.text.strip()
+            if not actor_name: continue
+            aria_label = link.get('aria-label', '').lower()
+            if 'female pornstar' in aria_label: female_actors.add(actor_name)
+            elif 'male pornstar' in aria_label: male_actors.add(actor_name)
+            elif 'transgender pornstar' in aria_label: trans_actors.add(actor_name)
+
+    tag_elements = soup.find_all("a", href=TAG_HREF)
+    scraped_tags = {tag.text.strip().lower() for tag in tag_elements if tag.text.strip()}
+    # Only the search-link tags, in page order, as master.get_video_tags has always returned them.
+    search_tags = tuple(tag.text.strip().lower() for tag in tag_elements if SEARCH_HREF.search(tag.get("href", "")))
+
+    canonical_url = final_url
+    canonical_tag = soup.find("link", rel="canonical")
+    if canonical_tag and canonical_tag.get("href"):
+        canonical_url = canonical_tag["href"]
+
+    og_image = None
+    thumb_tag = soup.find("meta", property="og:image")
+    if thumb_tag and thumb_tag.get("content"):
+        og_image = thumb_tag["content"]
+
+    info = PageInfo(title, channel_name, scraped_tags, sorted(male_actors), sorted(female_actors),
+                    sorted(trans_actors), final_url, canonical_url, og_image, search_tags)
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - start, "video_page")
+    return info
+
+
+def parse_body(body, encoding, final_url):
+    """parse_page for raw response bytes; picklable, so it can run in a process pool."""
+    return parse_page(body.decode(encoding or "utf-8", errors="replace"), final_url)
+
+
+def get_cached_page(url):
+    """Returns a cached PageInfo if it is still fresh, else None."""
+    with _cache_lock:
+        entry = _cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        if entry:
+            del _cache[url]
+    return None
+
+
+def _cache_page(info, *urls):
+    expires_at = time.monotonic() + PAGE_CACHE_TTL
+    with _cache_lock:
+        for url in urls:
+            _cache[url] = (expires_at, info)
+            _cache.move_to_end(url)
+        while len(_cache) > PAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def extract_page(url, timeout=15):
+    """
+    Downloads and parses a video page once. Raises requests.RequestException on
+    failure. The result is cached under both the requested and the final URL.
+    """
+    info = get_cached_page(url)
+    if info is not None:
+        return info
+    response = http_client.get(url, timeout=timeout)
+    response.raise_for_status()
+    info = parse_page(response.text, response.url)
+    _cache_page(info, url, response.url)
+    return info
+
+
+class _HeadScanner(HTMLParser):
+    """Watches the tag stream for og:image and stops at the end of <head>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.og_image = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta" and not self.og_image:
+            attrs = dict(attrs)
+            if attrs.get("property") == "og:image" and attrs.get("content"):
+                self.og_image = attrs["content"]
+                self.done = True
+        elif tag == "body":
+            self.done = True
+
+    handle_startendtag = handle_starttag
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.done = True
+
+
+def fetch_og_image(url, timeout=10):
+    """
+    Returns the page's og:image URL (or None), reading only as much of the body
+    as needed. A freshly extracted page in the cache is used without a request.
+    Raises requests.RequestException on failure.
+    """
+    info = get_cached_page(url)
+    if info is not None:
+        return info.og_image
+    response = http_client.get(url, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        scanner = _HeadScanner()
+        received = 0
+        for chunk in response.iter_content(HEAD_SCAN_CHUNK):
+            scanner.feed(decoder.decode(chunk))
+            received += len(chunk)
+            if scanner.done or received >= HEAD_SCAN_LIMIT:
+                break
+        return scanner.og_image
+    finally:
+        response.close()  # Drops the rest of the body instead of downloading it.
@@ -5,9 +5,11 @@ import requests
 from bs4 import BeautifulSoup
 import logging
 from concurrent.futures import ThreadPoolExecutor
-import json
 import os
-import threading
+
+import http_client
+from page_extract import fetch_og_image
+from thumbnail_store import ThumbnailStore
 
 app = Flask(__name__)
 CORS(app)
@@ -15,8 +17,8 @@ CORS(app)
 # --- Configuration ---
 VIDEO_FILE = "classified_videos.txt"
 CACHE_FILE = "thumbnail_cache.json"
-THUMBNAIL_CACHE = {}
-cache_lock = threading.Lock()
+THUMBNAIL_STORE = ThumbnailStore(CACHE_FILE)
+THUMBNAIL_CACHE = THUMBNAIL_STORE.data
 
 logging.basicConfig(level=logging.INFO)
 
@@ -24,11 +26,7 @@ logging.basicConfig(level=logging.INFO)
 
 def fetch_video_details(url):
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Referer": "https://www.google.com"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(url, headers=http_client.SEARCH_REFERER, timeout=15)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
 
@@ -99,36 +97,23 @@ def classify(tags, male_actors, female_actors, trans_actors):
 # --- Caching and Thumbnail Logic ---
 
 def load_cache():
-    global THUMBNAIL_CACHE
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            try: THUMBNAIL_CACHE = json.load(f)
-            except json.JSONDecodeError: THUMBNAIL_CACHE = {}
+    THUMBNAIL_STORE.load()
     logging.info(f"Loaded {len(THUMBNAIL_CACHE)} items from cache.")
 
 def save_cache():
-    with cache_lock:
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(THUMBNAIL_CACHE, f, indent=4)
+    THUMBNAIL_STORE.flush()
 
 def get_or_generate_thumbnail(link):
     if link in THUMBNAIL_CACHE: return THUMBNAIL_CACHE[link]
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(link, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        thumb_tag = soup.find("meta", property="og:image")
-        if thumb_tag and thumb_tag.get("content"):
-            thumb_url = thumb_tag.get("content")
-            THUMBNAIL_CACHE[link] = thumb_url
-            save_cache()
+        thumb_url = fetch_og_image(link, timeout=10)
+        if thumb_url:
+            THUMBNAIL_STORE.set(link, thumb_url)
             return thumb_url
     except requests.exceptions.RequestException as e:
         logging.warning(f"Thumbnail fetch failed for {link}: {e}")
     no_thumb_url = "https://via.placeholder.com/320x180?text=No+Thumbnail"
-    THUMBNAIL_CACHE[link] = no_thumb_url
-    save_cache()
+    THUMBNAIL_STORE.set(link, no_thumb_url)
     return no_thumb_url
 
 def parse_videos():
@@ -198,9 +183,7 @@ def remove_video():
         return jsonify({"error": "Video not found in file."}), 404
     with open(VIDEO_FILE, "w", encoding="utf-8") as f:
         f.writelines(lines_to_keep)
-    if link_to_remove in THUMBNAIL_CACHE:
-        del THUMBNAIL_CACHE[link_to_remove]
-        save_cache()
+    THUMBNAIL_STORE.delete(link_to_remove)
     return jsonify({"message": "Video removed successfully."}), 200
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+# process_lock.py
+
+"""
+Exclusive lock shared by every process on this host (gunicorn workers, scripts)
+and by every thread in this process. Uses flock on a sidecar lock file; on
+platforms without fcntl it falls back to a plain thread lock.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: the dev server is a single process anyway.
+    fcntl = None
+
+
+class ProcessLock:
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A lock held by another thread at fork time would otherwise never be released in the child.
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except OSError:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
@@ -0,0 +1,164 @@
+# profiling.py
+
+"""
+Opt-in per-request cProfile capture for every blueprint.
+Enabled with PROFILE_REQUESTS=1. A request is profiled when it carries the
+X-Profile header (equal to PROFILE_TOKEN, if one is set), or, with
+PROFILE_SLOW_MS set, every request is profiled and the profile is kept only
+when it took longer than that. Profiling every request roughly doubles its
+CPU cost, so the threshold mode is meant for short investigations.
+
+Profiles are pstats dumps in PROFILE_DIR, newest PROFILE_KEEP kept. They are
+listed at /admin/profiles and downloaded from /admin/profiles/<name>
+(?format=text gives the top functions by cumulative time instead).
+Open a download with `python -m pstats <file>` or snakeviz. PROFILE_TOKEN
+also guards the admin routes (X-Profile header or ?token=); set it anywhere
+but a local machine.
+"""
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import time
+
+from flask import Response, abort, g, jsonify, request, send_from_directory
+
+PROFILE_ENABLED = os.environ.get("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.path.abspath(os.environ.get("PROFILE_DIR", "profiles"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))  # 0 disables threshold capture.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_HEADER = "X-Profile"
+TEXT_LIMIT = 60  # Functions shown by ?format=text.
+SORT_KEYS = {key.value for key in pstats.SortKey} | {"tottime"}
+
+_sequence = itertools.count()
+_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _authorized(value):
+    return not PROFILE_TOKEN or value == PROFILE_TOKEN
+
+
+def _profile_name(profile_id, duration_ms):
+    endpoint = request.url_rule.rule if request.url_rule else request.path
+    slug = _UNSAFE.sub("-", endpoint).strip("-") or "root"
+    return f"{profile_id}__{request.method}__{slug}__{int(duration_ms)}ms.prof"
+
+
+def _rotate():
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".prof"))
+    for name in names[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else names:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+
+
+def _save(profiler, name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, name)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    profiler.dump_stats(temp_path)
+    os.replace(temp_path, path)
+    _rotate()
+
+
+# --- REQUEST HOOKS ---
+def _start_profile():
+    requested = PROFILE_HEADER in request.headers and _authorized(request.headers[PROFILE_HEADER])
+    if not requested and not PROFILE_SLOW_MS:
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process; skip overlapping requests.
+        return
+    g.profile = (profiler, time.perf_counter(), requested,
+                 f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence):06d}")
+
+
+def _tag_response(response):
+    state = g.get("profile")
+    if state and state[2]:
+        response.headers["X-Profile-Id"] = state[3]
+    return response
+
+
+def _finish_profile(exc):
+    state = g.pop("profile", None)
+    if state is None:
+        return
+    profiler, start, requested, profile_id = state
+    profiler.disable()
+    duration_ms = (time.perf_counter() - start) * 1000
+    if not requested and duration_ms < PROFILE_SLOW_MS:
+        return
+    try:
+        _save(profiler, _profile_name(profile_id, duration_ms))
+    except OSError as e:
+        logging.error(f"Could not save request profile {profile_id}: {e}")
+
+
+# --- ADMIN ROUTES ---
+def _check_admin():
+    if not _authorized(request.headers.get(PROFILE_HEADER) or request.args.get("token")):
+        abort(403)
+
+
+def list_profiles():
+    """Lists saved profiles, newest first."""
+    _check_admin()
+    profiles = []
+    try:
+        names = sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith(".prof")), reverse=True)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        parts = name[:-len(".prof")].split("__")
+        if len(parts) != 4:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            continue  # Rotated away meanwhile.
+        profiles.append({"name": name, "id": parts[0], "method": parts[1], "endpoint": parts[2],
+                         "duration_ms": int(parts[3][:-2]), "size": size})
+    return jsonify({"profiles": profiles, "keep": PROFILE_KEEP, "slow_ms": PROFILE_SLOW_MS})
+
+
+def get_profile(name):
+    """Downloads one profile by file name or id; ?format=text renders it with pstats."""
+    _check_admin()
+    if not name.endswith(".prof"):
+        matches = [n for n in os.listdir(PROFILE_DIR) if n.startswith(name + "__")] if os.path.isdir(PROFILE_DIR) else []
+        if not matches:
+            abort(404)
+        name = matches[0]
+    if request.args.get("format") == "text":
+        path = os.path.join(PROFILE_DIR, os.path.basename(name))
+        if not os.path.isfile(path):
+            abort(404)
+        sort = request.args.get("sort", "cumulative")
+        if sort not in SORT_KEYS:
+            abort(400)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(TEXT_LIMIT)
+        return Response(out.getvalue(), mimetype="text/plain")
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True, mimetype="application/octet-stream")
+
+
+def init_app(app):
+    """Installs the profiling hooks and admin routes when PROFILE_REQUESTS is set."""
+    if not PROFILE_ENABLED:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_profile)
+    app.add_url_rule("/admin/profiles", "list_profiles", list_profiles)
+    app.add_url_rule("/admin/profiles/<name>", "get_profile", get_profile)
+    logging.info(f"Request profiling enabled; profiles go to {PROFILE_DIR}.")
@@ -0,0 +1,141 @@
+# rate_limiter.py
+
+"""
+Shared per-host token-bucket rate limiting.
+Workers reserve a token under a short lock and sleep outside it, so waiting
+threads never block each other; requests go out at the configured rate and
+no slower. A bucket can retune itself from x-ratelimit-remaining /
+x-ratelimit-reset response headers (reddit) to spread the remaining quota
+evenly over the rest of the window.
+
+Limits come from DEFAULT_RATE_LIMITS, overridable with RATE_LIMITS, e.g.
+RATE_LIMITS="reddit.com=0.5:10,pornhub.com=4:8" (requests/second:burst).
+Limits are per process: with several gunicorn workers each gets its own bucket.
+Header adaptation still keeps the workers together inside reddit's shared quota.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+# host suffix -> (requests per second, burst)
+DEFAULT_RATE_LIMITS = {
+    "reddit.com": (100 / 600, 10),  # Until the first response headers arrive.
+    "pornhub.com": (3.0, 5),
+}
+RESERVE = 5  # Requests of the upstream quota left unused as a safety margin.
+
+
+def _parse_limits(spec):
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, value = entry.partition("=")
+        rate, _, burst = value.partition(":")
+        limits[host.strip().lower()] = (float(rate), float(burst or 1))
+    return limits
+
+
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **_parse_limits(os.environ.get("RATE_LIMITS", ""))}
+
+
+class TokenBucket:
+    """Thread-safe token bucket. acquire() reserves a slot and sleeps outside the lock."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.waited = 0.0  # Total seconds callers have spent waiting, for monitoring.
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._reset_lock()
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """Takes tokens now (possibly going into debt). Returns the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """Blocks until tokens are available. Returns the seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Holds back every caller for at least seconds (e.g. after an unexpected 429)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+    def update_from_headers(self, headers):
+        """Retunes the rate so the remaining upstream quota lasts until the window resets."""
+        if 'x-ratelimit-remaining' not in headers or 'x-ratelimit-reset' not in headers:
+            return
+        try:
+            remaining = float(headers['x-ratelimit-remaining'])
+            reset_seconds = max(float(headers['x-ratelimit-reset']), 1.0)
+        except ValueError:
+            return
+        usable = max(remaining - RESERVE, 0)
+        with self._lock:
+            self._refill(time.monotonic())
+            # With the quota used up, let one request through as the window resets to learn the new quota.
+            self.rate = max(usable, 1) / reset_seconds
+            self._tokens = min(self._tokens, usable)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _limit_key(host):
+    for key in RATE_LIMITS:
+        if host == key or host.endswith("." + key):
+            return key
+    return None
+
+
+def limiter_for(url):
+    """Returns the shared bucket for url's host, or None if the host is not rate limited."""
+    key = _limit_key(urlsplit(url).netloc.lower().split(":")[0])
+    if key is None:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, burst = RATE_LIMITS[key]
+            bucket = _buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+
+def wait_for(url):
+    """Acquires a token for url's host if it is rate limited. Returns the seconds waited."""
+    bucket = limiter_for(url)
+    return bucket.acquire() if bucket else 0.0
+
+
+def get_stats():
+    """Returns {host suffix: {"rate", "waited"}} for every bucket created so far."""
+    with _buckets_lock:
+        return {key: {"rate": bucket.rate, "waited": bucket.waited} for key, bucket in _buckets.items()}
+
+
+def _reset_after_fork():
+    global _buckets_lock
+    _buckets_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,51 +1,57 @@
 import requests
 from bs4 import BeautifulSoup
-import time
 import re
 import os
-from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+import rate_limiter
 
 # --- Configuration ---
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Referer": "https://www.google.com"
-}
 OUTPUT_FILE = "classified_videos.txt"
+FAILED_DETAILS = ("Untitled", set(), [], [], [])
 
 # --- Core Functions ---
 
+def parse_details(html):
+    """Extracts title, tags and actors (with genders) from a video page."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    title_tag = soup.find("title")
+    title = "Untitled"
+    if title_tag:
+        title = title_tag.text.strip().replace(" - Pornhub.com", "").strip()
+
+    male_actors, female_actors, trans_actors = set(), set(), set()
+    actor_wrapper = soup.select_one('.pstar-list-btn')
+    if actor_wrapper:
+        actor_links = actor_wrapper.find_all('a', href=re.compile(r'/pornstar/'))
+        for link in actor_links:
+            actor_name = link.text.strip()
+            if link.find("i", class_="icon-male"): male_actors.add(actor_name)
+            elif link.find("i", class_="icon-female"): female_actors.add(actor_name)
+            elif link.find("i", class_="icon-trans"): trans_actors.add(actor_name)
+    
+    tag_elements = soup.find_all("a", href=re.compile(r"/video/search\?search=|/tag/"))
+    tags = {tag.text.strip().lower() for tag in tag_elements if tag.text.strip()}
+
+    return title, tags, list(male_actors), list(female_actors), list(trans_actors)
+
+def parse_body_details(body, encoding, final_url):
+    """parse_details for raw response bytes, as async_fetch's parse= (picklable for its process pool)."""
+    return parse_details(body.decode(encoding or "utf-8", errors="replace"))
+
 def fetch_video_details(url):
     """
     Fetches title, actors (with genders), and tags in a single request.
     """
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
+        response = http_client.get(url, headers=http_client.SEARCH_REFERER, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        title_tag = soup.find("title")
-        title = "Untitled"
-        if title_tag:
-            title = title_tag.text.strip().replace(" - Pornhub.com", "").strip()
-
-        male_actors, female_actors, trans_actors = set(), set(), set()
-        actor_wrapper = soup.select_one('.pstar-list-btn')
-        if actor_wrapper:
-            actor_links = actor_wrapper.find_all('a', href=re.compile(r'/pornstar/'))
-            for link in actor_links:
-                actor_name = link.text.strip()
-                if link.find("i", class_="icon-male"): male_actors.add(actor_name)
-                elif link.find("i", class_="icon-female"): female_actors.add(actor_name)
-                elif link.find("i", class_="icon-trans"): trans_actors.add(actor_name)
-        
-        tag_elements = soup.find_all("a", href=re.compile(r"/video/search\?search=|/tag/"))
-        tags = {tag.text.strip().lower() for tag in tag_elements if tag.text.strip()}
-
-        return title, tags, list(male_actors), list(female_actors), list(trans_actors)
+        return parse_details(response.text)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching details for {url}: {e}")
-        return "Untitled", set(), [], [], []
+        return FAILED_DETAILS
 
 def classify_by_tags(tags):
     """Fallback classification based on tags if actor info is unavailable."""
@@ -96,11 +102,15 @@ def process_link(url):
     url = url.strip()
     if not url: return None
     print(f"Processing: {url}")
-    title, tags, male_actors, female_actors, trans_actors = fetch_video_details(url)
+    rate_limiter.wait_for(url)
+    return label_line(url, fetch_video_details(url))
+
+def label_line(url, details):
+    """The output line for one video's fetched details."""
+    title, tags, male_actors, female_actors, trans_actors = details
     if title == "Untitled" and not tags and not male_actors and not female_actors:
         return f"[Failed to process] - {url}"
     label = classify(tags, male_actors, female_actors, trans_actors)
-    time.sleep(1) 
     return f"{title} ({label}) - {url}"
 
 def process_new_links():
@@ -129,13 +139,18 @@ def reclassify_existing_videos():
         print("No URLs found in the file.")
         return
     print(f"Found {len(urls_to_reclassify)} videos. Starting re-classification (this may take a while)...")
-    updated_lines = []
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = executor.map(process_link, urls_to_reclassify)
-        for result in results:
-            if result:
-                updated_lines.append(result)
-                print(f"  -> Re-classified: {result}")
+    # Pages are fetched on the asyncio engine and parsed in its process pool (see async_fetch).
+    from async_fetch import iter_fetch  # Imported lazily: only the bulk re-classification needs aiohttp.
+    results_by_url = {}
+    for url, details, error in iter_fetch(dict.fromkeys(urls_to_reclassify), parse=parse_body_details,
+                                          headers=http_client.SEARCH_REFERER):
+        if error:
+            print(f"Error fetching details for {url}: {error}")
+            details = FAILED_DETAILS
+        result = label_line(url, details)
+        results_by_url[url] = result
+        print(f"  -> Re-classified: {result}")
+    updated_lines = [results_by_url[url] for url in urls_to_reclassify if url in results_by_url]
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         f.write("\n".join(updated_lines) + "\n")
     print(f"\n✅ Re-classification complete. '{OUTPUT_FILE}' has been updated.")
@@ -2,15 +2,18 @@
 
 import requests
 from bs4 import BeautifulSoup
-import time
 import re
 import os
-from concurrent.futures import ThreadPoolExecutor
-from classification_logic import classify_video
+import sys
+import http_client
+import rate_limiter
+from checkpoint import Checkpoint, checkpoint_path, run_checkpointed, thread_runner
+from batch_classify import classify_corpus
+from classification_cache import get_classification_cache
+from classification_logic import feature_row
+from storage import get_storage, make_features
+from video_index import VideoRecord
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-}
 OUTPUT_FILE = "classified_videos.txt"
 
 def fetch_video_details(url):
@@ -18,7 +21,7 @@ def fetch_video_details(url):
     UPDATED: Now scrapes channel name in addition to other details.
     """
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
+        response = http_client.get(url, timeout=15)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
 
@@ -67,16 +70,31 @@ def process_link(url):
     if not url: return None
     
     print(f"Processing: {url}")
-    title, channel, scraped_tags, males, females, trans = fetch_video_details(url)
-    
+    rate_limiter.wait_for(url)
+    return classify_details(url, fetch_video_details(url))
+
+def classify_details(url, details):
+    """Saves the raw features of fetched details and returns the classified output line."""
+    title, channel, scraped_tags, males, females, trans = details
     if title == "Untitled":
         return f"[Failed to process] | | {url}"
+
+    get_storage().save_features([make_features(url, title, channel, scraped_tags, males, females, trans)])
+    final_tags = get_classification_cache().classify(title, channel, scraped_tags, males, females, trans)
     
-    final_tags = classify_video(title, channel, scraped_tags, males, females, trans)
-    
-    time.sleep(1)
     return f"{title} | {','.join(final_tags)} | {url}"
 
+def async_runner(urls):
+    """run_checkpointed runner that fetches with the asyncio engine instead of a thread pool."""
+    from async_fetch import iter_fetch  # Imported lazily: only the bulk tools need aiohttp.
+    for url, info, error in iter_fetch(urls):
+        if error:
+            print(f"Error fetching details for {url}: {error}")
+            yield url, f"[Failed to process] | | {url}"
+        else:
+            yield url, classify_details(url, (info.title, info.channel, info.tags,
+                                              info.male_actors, info.female_actors, info.trans_actors))
+
 def process_new_links():
     user_input = input("\nEnter a Pornhub link or a comma-separated list of links:\n> ")
     links = [link.strip() for link in user_input.split(",") if link.strip()]
@@ -94,49 +112,100 @@ def process_new_links():
                 
     print("\n✅ All new links processed and added to the file.")
 
-def reclassify_existing_videos():
-    if not os.path.exists(OUTPUT_FILE):
-        print(f"Error: '{OUTPUT_FILE}' not found. There is nothing to re-classify.")
-        return
-        
+def reclassify_existing_videos(resume=False, use_async=True):
+    """
+    Re-fetches and re-classifies every stored video. Progress is
+    checkpointed per link; resume=True skips links finished by an interrupted run.
+    Pages are fetched with the asyncio engine and parsed in its process pool;
+    use_async=False uses 5 threads instead, which parse under the GIL.
+    """
     print("Reading existing videos...")
-    urls_to_reclassify = []
-    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            match = re.search(r'(https?://[^\s]+)', line)
-            if match:
-                urls_to_reclassify.append(match.group(0))
+    urls_to_reclassify = [record.link for record in get_storage().load_videos()]
 
     if not urls_to_reclassify:
-        print("No URLs found in the file.")
+        print("No videos found. There is nothing to re-classify.")
         return
         
+    checkpoint = Checkpoint(OUTPUT_FILE, "reclassify", resume=resume)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} videos already done.")
     print(f"Found {len(urls_to_reclassify)} videos. Starting re-classification...")
-    
-    updated_lines = []
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = executor.map(process_link, urls_to_reclassify)
-        for result in results:
+
+    failed = {}
+    try:
+        runner = async_runner if use_async else thread_runner(process_link, max_workers=5)
+        for url, result in run_checkpointed(urls_to_reclassify, runner, checkpoint,
+                                            is_done=lambda r: not r.startswith("[Failed to process]")):
             if result:
-                updated_lines.append(result)
+                if url not in checkpoint.done:
+                    failed[url] = result
                 print(f"  -> Re-classified: {result}")
-                
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        f.write("\n".join(updated_lines) + "\n")
-        
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. {len(checkpoint.done)} videos are saved; run with --resume to continue.")
+        return
+
+    updated_lines = [checkpoint.done.get(url) or failed[url] for url in urls_to_reclassify
+                     if url in checkpoint.done or url in failed]
+    checkpoint.finish(updated_lines, known_links=set(urls_to_reclassify))
+
     print(f"\n✅ Re-classification complete. '{OUTPUT_FILE}' has been updated.")
 
+def reclassify_from_features():
+    """
+    Recomputes tags for every stored video from its saved raw features, with no
+    network access. Videos without saved features keep their current tags.
+    """
+    storage = get_storage()
+    records = storage.load_videos()
+    if not records:
+        print("No videos found. There is nothing to re-classify.")
+        return
+
+    features = storage.load_features()
+    known = [features[r.link] for r in records if r.link in features]
+    cache = get_classification_cache()
+    new_tags = iter(cache.classify_many(
+        [feature_row(f) for f in known],
+        classify=classify_corpus))
+    cache.flush()
+    updated, changed, missing = [], 0, 0
+    for record in records:
+        if record.link not in features:
+            missing += 1
+            updated.append(record)
+            continue
+        tags = tuple(next(new_tags))
+        changed += tags != record.tags
+        updated.append(VideoRecord(record.title, tags, record.link))
+
+    storage.replace_videos(updated, known_links={record.link for record in records})
+    print(f"\n✅ Offline re-classification complete: {len(records) - missing} re-classified "
+          f"({changed} changed, {cache.misses} computed, {cache.hits} from cache), "
+          f"{missing} without saved features left as they were.")
+    if missing:
+        print("Run option 2 once to fetch and save features for the remaining videos.")
+
 def main():
     while True:
         print("\n--- Video Classification Tool ---")
         print("1. Add and classify new video links")
         print("2. Re-classify all existing videos in the file")
-        print("3. Exit")
+        print("3. Re-classify offline from saved features")
+        print("4. Exit")
         choice = input("> ")
         if choice == "1": process_new_links()
-        elif choice == "2": reclassify_existing_videos()
-        elif choice == "3": break
-        else: print("Invalid choice. Please enter 1, 2, or 3.")
+        elif choice == "2":
+            resume = os.path.exists(checkpoint_path(OUTPUT_FILE, "reclassify")) and input("Resume the interrupted run? [y/N] ").strip().lower() == "y"
+            reclassify_existing_videos(resume=resume)
+        elif choice == "3": reclassify_from_features()
+        elif choice == "4": break
+        else: print("Invalid choice. Please enter 1, 2, 3, or 4.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    flags = set(sys.argv[1:])
+    if "--offline" in flags:
+        reclassify_from_features()
+    elif flags & {"--resume", "--async", "--threads"}:
+        reclassify_existing_videos(resume="--resume" in flags, use_async="--threads" not in flags)
+    else:
+        main()
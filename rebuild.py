@@ -1,30 +1,37 @@
 # rebuild_from_cache.py
 
-import json
 import os
-from concurrent.futures import ThreadPoolExecutor
-from re_classify_2 import process_link # We reuse the processing logic from your existing tool
+import shutil
+import sys
+from batch_classify import classify_corpus
+from checkpoint import Checkpoint, run_checkpointed, thread_runner
+from classification_cache import get_classification_cache
+from classification_logic import feature_row
+from re_classify_2 import async_runner, process_link # We reuse the processing logic from your existing tool
+from storage import get_storage
+from thumbnail_store import ThumbnailStore
 
 CACHE_FILE = "thumbnail_cache.json"
 OUTPUT_FILE = "classified_videos.txt"
 BACKUP_FILE = "classified_videos.txt.bak"
 
-def rebuild_from_cache():
+def rebuild_from_cache(offline=False, resume=False, use_async=True):
     """
     Reads all video links from the JSON cache, re-classifies them,
     and rebuilds the classified_videos.txt file from scratch.
+    With offline=True, links that have saved raw features are classified from
+    those instead of being fetched again; only the rest go to the network.
+    Fetched links are checkpointed as they finish; resume=True continues an
+    interrupted run instead of starting over. Pages are fetched with the asyncio
+    engine and parsed in its process pool; use_async=False uses 10 threads
+    instead, which parse under the GIL.
     """
     if not os.path.exists(CACHE_FILE):
         print(f"Error: Cache file '{CACHE_FILE}' not found. Cannot rebuild.")
         return
 
-    print(f"Reading links from '{CACHE_FILE}'...")
-    with open(CACHE_FILE, "r", encoding="utf-8") as f:
-        try:
-            thumbnail_cache = json.load(f)
-        except json.JSONDecodeError:
-            print(f"Error: Could not read '{CACHE_FILE}'. It might be corrupted.")
-            return
+    print(f"Reading links from '{CACHE_FILE}' and its journal...")
+    thumbnail_cache = ThumbnailStore(CACHE_FILE).load()
             
     urls_to_process = list(thumbnail_cache.keys())
     
@@ -33,33 +40,57 @@ def rebuild_from_cache():
         return
 
     print(f"Found {len(urls_to_process)} links. Starting rebuild process...")
-    print("This may take a while depending on the number of videos.")
+    stored_links = {record.link for record in get_storage().load_videos()}
 
-    # --- Process all links using the existing logic ---
-    updated_lines = []
-    # Using ThreadPoolExecutor to speed up the process significantly
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = executor.map(process_link, urls_to_process)
-        for result in results:
+    # --- Classify links with saved features locally ---
+    all_urls = urls_to_process
+    lines_by_url = {}
+    if offline:
+        features = get_storage().load_features()
+        known = [url for url in urls_to_process if url in features]
+        remaining = [url for url in urls_to_process if url not in features]
+        cache = get_classification_cache()
+        all_tags = cache.classify_many([feature_row(features[url]) for url in known], classify=classify_corpus)
+        cache.flush()
+        for url, tags in zip(known, all_tags):
+            lines_by_url[url] = f"{features[url]['title']} | {','.join(tags)} | {url}"
+        print(f"Classified {len(lines_by_url)} links from saved features ({cache.hits} from cache); "
+              f"{len(remaining)} left to fetch.")
+        urls_to_process = remaining
+
+    checkpoint = Checkpoint(OUTPUT_FILE, "rebuild", resume=resume)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} links already done.")
+    if len(checkpoint.done) < len(urls_to_process):
+        print("This may take a while depending on the number of videos.")
+
+    # --- Process the remaining links using the existing logic, checkpointing each one ---
+    try:
+        runner = async_runner if use_async else thread_runner(process_link, max_workers=10)
+        for url, result in run_checkpointed(urls_to_process, runner, checkpoint,
+                                            is_done=lambda r: "[Failed to process]" not in r):
             if result and "[Failed to process]" not in result:
-                updated_lines.append(result)
                 print(f"  -> Re-classified: {result.split(' | ')[0]}")
             elif result:
                  print(f"  -> Failed to process a link.")
-
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. {len(checkpoint.done)} links are saved; run with --resume to continue.")
+        return
+    lines_by_url.update(checkpoint.done)
+    updated_lines = [lines_by_url[url] for url in all_urls if url in lines_by_url]
 
     # --- Backup the old file just in case ---
     if os.path.exists(OUTPUT_FILE):
         print(f"Backing up existing '{OUTPUT_FILE}' to '{BACKUP_FILE}'...")
-        os.rename(OUTPUT_FILE, BACKUP_FILE)
+        shutil.copy2(OUTPUT_FILE, BACKUP_FILE)
 
-    # --- Write the new, complete file ---
+    # --- Swap in the new, complete file ---
     print(f"Writing {len(updated_lines)} videos to '{OUTPUT_FILE}'...")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        f.write("\n".join(updated_lines) + "\n")
+    checkpoint.finish(updated_lines, known_links=stored_links)
 
     print("\n✅ Rebuild complete!")
     print(f"'{OUTPUT_FILE}' has been successfully rebuilt from the cache.")
 
 if __name__ == "__main__":
-    rebuild_from_cache()
\ No newline at end of file
+    flags = set(sys.argv[1:])
+    rebuild_from_cache(offline="--offline" in flags, resume="--resume" in flags, use_async="--threads" not in flags)
@@ -1,23 +1,36 @@
 # reddit.py - MODIFIED
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 import requests
-import json
-import os
 import time
-import threading
 import html
 from bs4 import BeautifulSoup
 
+import http_client
+import metrics
+import rate_limiter
+from batch_ingest import ingest_batch
+from item_index import ItemIndex
+from storage import get_storage
+
 # 1. Create a Blueprint object with a URL prefix
 reddit_bp = Blueprint('reddit', __name__, url_prefix='/reddit-gallery')
 
-DATA_FILE = "cleaned_data.json"
+COLLECTION = "reddit"
+STORAGE = get_storage()
+
+
+def subreddit_name(item):
+    """The item's subreddit as shown in the UI ("r/name"), or None."""
+    if not item.get("subreddit"):
+        return None
+    return f"r/{item['subreddit'].split('/')[-1]}"
+
+
+REDDIT_INDEX = ItemIndex(STORAGE, COLLECTION, facets={"subreddits": lambda item: filter(None, [subreddit_name(item)])})
 
 # --- ALL HELPER FUNCTIONS (rate limiting, data handling, scraping) REMAIN EXACTLY THE SAME ---
-rate_limit_status = {
-    "remaining": 100, "reset_time": time.time() + 600, "lock": threading.Lock()
-}
+REDDIT_LIMITER = rate_limiter.limiter_for("https://www.reddit.com")
 redgifs_token = { "token": None, "expiry": 0 }
 
 def get_redgifs_token():
@@ -25,7 +38,7 @@ def get_redgifs_token():
         return redgifs_token["token"]
     print("      - Fetching new RedGifs API token...")
     try:
-        res = requests.get("https://api.redgifs.com/v2/auth/temporary")
+        res = http_client.get("https://api.redgifs.com/v2/auth/temporary")
         res.raise_for_status()
         data = res.json()
         redgifs_token["token"] = data.get("token")
@@ -38,37 +51,27 @@ def get_redgifs_token():
         return None
 
 def update_rate_limit_status(headers):
-    with rate_limit_status['lock']:
-        if 'x-ratelimit-remaining' in headers:
-            rate_limit_status['remaining'] = float(headers['x-ratelimit-remaining'])
-        if 'x-ratelimit-reset' in headers:
-            rate_limit_status['reset_time'] = time.time() + int(headers['x-ratelimit-reset'])
+    REDDIT_LIMITER.update_from_headers(headers)
 
 def check_and_wait_for_rate_limit():
-    with rate_limit_status['lock']:
-        if rate_limit_status['remaining'] < 15:
-            wait_duration = rate_limit_status['reset_time'] - time.time()
-            if wait_duration > 0:
-                print(f"\n[RATE LIMIT] Proactively waiting for {wait_duration + 1:.0f}s...")
-                time.sleep(wait_duration + 1)
+    # Token bucket: threads reserve their slot and wait without holding any lock.
+    REDDIT_LIMITER.acquire()
 
 def load_data():
-    if not os.path.exists(DATA_FILE): return []
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f: return json.load(f)
-    except (json.JSONDecodeError, IOError): return []
+    return STORAGE.load_items(COLLECTION)
 
 def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f: json.dump(data, f, indent=4)
+    STORAGE.replace_items(COLLECTION, data)
 
 def scrape_reddit_post(post_url):
     if not post_url.endswith('.json'): post_url += ".json"
     check_and_wait_for_rate_limit()
     try:
-        headers = {"User-Agent": "MyGallery/1.0"}
-        response = requests.get(post_url, headers=headers, timeout=15)
+        headers = http_client.REDDIT_HEADERS
+        response = http_client.get(post_url, headers=headers, timeout=15)
         update_rate_limit_status(response.headers)
         response.raise_for_status()
+        start = time.perf_counter()
         data = response.json()
         crosspost_data = data[0]['data']['children'][0]['data']
         media_source_data = crosspost_data
@@ -77,6 +80,7 @@ def scrape_reddit_post(post_url):
         results, media_url, media_type = [], None, "image"
         clean_name = crosspost_data.get('subreddit_name_prefixed', '').split('/')[-1]
         normalized_subreddit = f"r/{clean_name}"
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - start, "reddit_post")
         if 'imgur.com' in media_source_data.get('domain', ''):
             imgur_url = media_source_data.get('url_overridden_by_dest')
             if not imgur_url: return [], "Could not find Imgur URL in post data."
@@ -87,7 +91,8 @@ def scrape_reddit_post(post_url):
                 media_type = "video"
             else:
                 try:
-                    imgur_res = requests.get(imgur_url, headers=headers, timeout=10)
+                    imgur_res = http_client.get(imgur_url, headers=headers, timeout=10)
+                    start = time.perf_counter()
                     imgur_soup = BeautifulSoup(imgur_res.text, "html.parser")
                     video_tag = imgur_soup.select_one('meta[property="og:video"]')
                     if video_tag and video_tag.get('content'):
@@ -97,6 +102,7 @@ def scrape_reddit_post(post_url):
                         image_tag = imgur_soup.select_one('meta[property="og:image"]')
                         if image_tag and image_tag.get('content'):
                             media_url = image_tag['content'].split('?')[0]
+                    metrics.PARSE_SECONDS.observe(time.perf_counter() - start, "imgur_page")
                 except Exception as e:
                     return [], f"Failed to scrape Imgur page: {e}"
         elif media_source_data.get('domain') == 'redgifs.com':
@@ -108,7 +114,7 @@ def scrape_reddit_post(post_url):
                 api_url = f"https://api.redgifs.com/v2/gifs/{gif_id}"
                 try:
                     auth_headers = {"Authorization": f"Bearer {token}"}
-                    rg_res = requests.get(api_url, headers=auth_headers, timeout=10)
+                    rg_res = http_client.get(api_url, headers=auth_headers, timeout=10)
                     rg_data = rg_res.json()
                     media_url = rg_data['gif']['urls']['hd']
                     media_type = "video"
@@ -148,8 +154,8 @@ def scrape_reddit_post(post_url):
         return results, None
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
-            print("      - Hit rate limit unexpectedly. Waiting 60s...")
-            time.sleep(60)
+            print("      - Hit rate limit unexpectedly. Backing off 60s...")
+            REDDIT_LIMITER.pause(60)
             return scrape_reddit_post(post_url)
         return [], f"HTTP Error: {e}"
     except Exception as e:
@@ -160,75 +166,89 @@ def scrape_reddit_post(post_url):
 # The final URL will be /reddit-gallery/subreddits
 @reddit_bp.route("/subreddits", methods=["GET"])
 def get_subreddits():
-    all_items = load_data()
-    subreddits = sorted(list({
-        f"r/{item.get('subreddit', '').split('/')[-1]}"
-        for item in all_items if item.get("subreddit")
-    }))
-    return jsonify(subreddits)
+    """
+    Every subreddit, sorted; ?counts=1 returns {"name", "count"} objects instead.
+    ?prefix= autocompletes (case-insensitive, up to ?limit= entries).
+    Served from the index's subreddit aggregate; the full list carries an ETag.
+    """
+    with_counts = request.args.get("counts", "") in ("1", "true")
+    prefix = request.args.get("prefix", "")
+    if prefix:
+        matches = REDDIT_INDEX.facet("subreddits", prefix, request.args.get("limit", type=int))
+        return jsonify([{"name": sub, "count": count} for sub, count in matches] if with_counts
+                       else [sub for sub, _ in matches])
+    body, etag = REDDIT_INDEX.facet_json("subreddits", with_counts)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Revalidate every time; unchanged lists come back as 304.
+    return response.make_conditional(request)
 
 # The final URL will be /reddit-gallery
 @reddit_bp.route("/", methods=["GET"])
 def get_gallery():
-    all_items = load_data()
+    # Filters run over the in-memory index. ?after=<id> (the previous response's
+    # "next") pages by cursor; ?page= offsets still work.
     selected_sub = request.args.get('subreddit', '').strip()
     search_query = request.args.get('q', '').lower().strip()
-    if selected_sub:
-        all_items = [
-            item for item in all_items
-            if f"r/{item.get('subreddit', '').split('/')[-1]}" == selected_sub
-        ]
-    if search_query:
-        all_items = [item for item in all_items if
-                     search_query in item.get('title', '').lower() or
-                     search_query in item.get('author', '').lower() or
-                     search_query in f"r/{item.get('subreddit', '').split('/')[-1]}".lower()]
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 50, type=int)
-    start = (page - 1) * limit
-    end = start + limit
-    paginated_items = all_items[start:end]
-    for item in paginated_items:
-        if 'subreddit' in item and item['subreddit']:
-            item['subreddit'] = f"r/{item['subreddit'].split('/')[-1]}"
+
+    def matches(item):
+        subreddit = f"r/{(item.get('subreddit') or '').split('/')[-1]}"
+        if selected_sub and subreddit != selected_sub:
+            return False
+        return not search_query or (search_query in item.get('title', '').lower() or
+                                    search_query in item.get('author', '').lower() or
+                                    search_query in subreddit.lower())
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = max(request.args.get('limit', 50, type=int), 0)
+    after = request.args.get('after') or None
+    try:
+        paginated_items, total, next_cursor = REDDIT_INDEX.query(
+            "", (page - 1) * limit, limit, after, matches if selected_sub or search_query else None)
+    except KeyError:
+        return jsonify({"error": "Unknown cursor; start again without 'after'."}), 400
+    # Copies, so the display form of the subreddit never leaks into the shared index.
+    paginated_items = [{**item, "subreddit": subreddit_name(item)} if item.get("subreddit") else item
+                       for item in paginated_items]
     return jsonify({
-        "items": paginated_items, "total": len(all_items),
-        "page": page, "limit": limit
+        "items": paginated_items, "total": total,
+        "page": page, "limit": limit, "next": next_cursor
     })
 
 @reddit_bp.route("/", methods=["POST"])
 def add_to_gallery():
     urls = request.json.get("urls")
     if not urls or not isinstance(urls, list): return jsonify({"error": "A list of URLs is required."}), 400
-    gallery_data = load_data()
-    existing_ids = {item.get('id') for item in gallery_data}
+    added_ids = set()
+    # Scrape posts in parallel (capped per host); ids are de-duplicated in input order.
+    scraped = ingest_batch(list(dict.fromkeys(urls)), scrape_reddit_post)
+    results_by_url = {url: (result, exc) for url, result, exc in scraped}
     results, new_items_to_add = [], []
     for url in urls:
         try:
-            items_from_post, error = scrape_reddit_post(url)
+            result, exc = results_by_url[url]
+            if exc: raise exc
+            items_from_post, error = result
             if error:
                 results.append({"status": "error", "url": url, "reason": error}); continue
             for item in items_from_post:
-                if item['id'] in existing_ids:
+                if item['id'] in added_ids or REDDIT_INDEX.has_id(item['id']):
                     results.append({"status": "duplicate", "url": url, "id": item['id']})
                 else:
                     new_items_to_add.append(item)
-                    existing_ids.add(item['id'])
+                    added_ids.add(item['id'])
                     results.append({"status": "success", "title": item['title']})
         except Exception as e:
             results.append({"status": "error", "url": url, "reason": str(e)})
     if new_items_to_add:
-        save_data(new_items_to_add + gallery_data)
+        REDDIT_INDEX.add(new_items_to_add)
     return jsonify(results), 201
 
 @reddit_bp.route("/", methods=["DELETE"])
 def remove_from_gallery():
     item_id = request.json.get("id")
     if not item_id: return jsonify({"error": "Item ID is missing."}), 400
-    gallery_data = load_data()
-    updated_data = [item for item in gallery_data if item.get("id") != item_id]
-    if len(updated_data) == len(gallery_data): return jsonify({"error": "Item not found."}), 404
-    save_data(updated_data)
+    if not REDDIT_INDEX.remove(item_id): return jsonify({"error": "Item not found."}), 404
     return jsonify({"message": "Item removed successfully."}), 200
 
 # 3. REMOVE the original app definition and the __main__ block
\ No newline at end of file
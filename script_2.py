@@ -1,15 +1,12 @@
-import requests
 from bs4 import BeautifulSoup
 import time
 import re
 
+import http_client
+
 def get_video_tags(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-        "Referer": "https://www.google.com"
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=http_client.SEARCH_REFERER, timeout=10)
         if response.status_code != 200:
             return []
 
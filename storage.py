@@ -0,0 +1,673 @@
+# storage.py
+
+"""
+Pluggable storage for videos, gallery items and reddit items.
+FileStorage keeps the original flat files (classified_videos.txt and the JSON
+lists); SQLiteStorage keeps all three in one WAL-mode database with indexes on
+id/link/subreddit/tag, so add, remove and look-up are row operations.
+The backend is chosen with the STORAGE_BACKEND environment variable.
+
+FileStorage records gallery/reddit adds and deletes in a per-collection
+append log next to the JSON file and folds it in with a background
+compaction, so anything else that touches the collections (cleanup.py,
+duplicate_r.py, analyze.py) goes through get_storage(). A script that reads
+the JSON files directly must run `python storage.py --compact` first.
+
+Both backends are safe to share between processes (gunicorn workers): file
+mutations hold a cross-process lock and replace files atomically, and SQLite
+serializes writers itself. Change stamps let each process notice the others' writes.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from process_lock import ProcessLock
+from video_index import VideoRecord, parse_video_file
+
+VIDEO_FILE = "classified_videos.txt"
+FEATURES_FILE = "video_features.jsonl"
+COLLECTION_FILES = {"gallery": "gallery_data.json", "reddit": "cleaned_data.json"}
+DATABASE_FILE = "media.db"
+
+
+def format_video_line(record):
+    return f"{record.title} | {','.join(record.tags)} | {record.link}\n"
+
+
+def make_features(link, title, channel, tags, male_actors, female_actors, trans_actors):
+    """Raw scraped inputs of classify_video for one link, as persisted at ingest time."""
+    return {
+        "link": link, "title": title, "channel": channel, "tags": sorted(tags),
+        "male_actors": list(male_actors), "female_actors": list(female_actors),
+        "trans_actors": list(trans_actors),
+    }
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _merge_since(records, current, known_links):
+    """
+    Merges the result of a long job into the videos as they are now: videos
+    added since the job read known_links are kept (appended), and videos
+    deleted since then are not brought back.
+    """
+    current_links = {r.link for r in current}
+    listed = {r.link for r in records}
+    kept = [r for r in records if r.link in current_links or r.link not in known_links]
+    return kept + [r for r in current if r.link not in known_links and r.link not in listed]
+
+
+def _atomic_write(path, write):
+    """Writes through a temp file and renames it, so readers never see a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+# --- COLLECTION LOG (flat file backend) ---
+COMPACT_AFTER = int(os.environ.get("COLLECTION_COMPACT_AFTER", 500))  # Log records before a background compaction.
+
+
+def _identity(path):
+    """Identifies one version of a file; a rewrite through os.replace always changes it."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+class _Replay:
+    """Items (oldest first) plus an id -> positions index, rebuilt from snapshot + log."""
+
+    def __init__(self, items=None, keep_items=True):
+        self.items = {} if keep_items else None  # position -> item
+        self.by_id = {}  # str(id) -> [positions]
+        self.next = 0
+        for item in reversed(items or []):  # Snapshots are stored newest first.
+            self.add(item)
+
+    def add(self, item):
+        if self.items is not None:
+            self.items[self.next] = item
+        self.by_id.setdefault(str(item.get("id")), []).append(self.next)
+        self.next += 1
+
+    def delete(self, item_id):
+        positions = self.by_id.pop(str(item_id), ())
+        if self.items is not None:
+            for position in positions:
+                del self.items[position]
+        return bool(positions)
+
+    def apply(self, raw):
+        """Applies complete log lines from raw bytes. Returns the bytes consumed."""
+        end = raw.rfind(b"\n") + 1  # A partially written final line is left for later.
+        for line in raw[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A torn line from a crash is dropped.
+            if "add" in record:
+                for item in reversed(record["add"]):
+                    self.add(item)
+            elif "del" in record:
+                self.delete(record["del"])
+        return end
+
+    def newest_first(self):
+        return list(reversed(self.items.values()))
+
+
+class _LogState:
+    """What one process has applied: which snapshot and log, and how far into the log."""
+
+    def __init__(self, identity, replay, inode=None, header=None, header_end=0, offset=0, records=0):
+        self.identity = identity      # Snapshot the log applies to.
+        self.replay = replay
+        self.inode = inode            # Log file inode, None without a log.
+        self.header = header
+        self.header_end = header_end  # Bytes of the header line.
+        self.offset = offset          # Bytes of the log applied so far.
+        self.records = records        # Log records applied (to trigger compaction).
+
+
+class _CollectionLog:
+    """
+    One gallery/reddit collection as a JSON snapshot plus an append-only log.
+    Adds and deletes append a one-line record ({"add": [...]} or {"del": id})
+    under the collection lock, checked against an in-memory id index, so their
+    cost does not depend on the collection size. A background compaction folds
+    the log into a new snapshot; only the final swap holds the lock.
+
+    The log's first line is a header naming the snapshot it applies to
+    ("base"), so readers never combine a snapshot with another snapshot's log,
+    and an epoch plus the bytes already folded, so the change stamp survives
+    compaction. A snapshot rewritten by an old script (no matching log) wins.
+    """
+
+    def __init__(self, path, lock, compact_after=COMPACT_AFTER):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compact_after = compact_after
+        self._lock = lock
+        self._stamp_cache = (None, None)
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._state = None  # _LogState of the id index, built on the first write
+        self._compacting = False
+
+    # --- Reading ---
+    def _read_snapshot(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                identity = [st.st_ino, st.st_mtime_ns, st.st_size]
+                try:
+                    return json.load(f), identity
+                except json.JSONDecodeError:
+                    return [], identity
+        except FileNotFoundError:
+            return [], None
+
+    def _read_log(self):
+        """Returns (header, header length, raw records, inode), or None without a log."""
+        try:
+            with open(self.log_path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        header_end = raw.find(b"\n") + 1
+        try:
+            header = json.loads(raw[:header_end])
+        except ValueError:
+            return None
+        return header, header_end, raw[header_end:], inode
+
+    def _read(self, keep_items, locked):
+        """
+        Reads a consistent snapshot + log. Returns (replay, state). Without the
+        lock, a read that raced a compaction is retried, finally under the lock.
+        """
+        for _ in range(3 if not locked else 1):
+            items, identity = self._read_snapshot()
+            log = self._read_log()
+            if log is not None and log[0].get("base") != identity:
+                if not locked:
+                    continue  # Raced a compaction (or a snapshot rewrite); look again.
+                log = None  # Under the lock this is final: the snapshot was rewritten without us.
+            elif log is None and not locked and _identity(self.path) != identity:
+                continue
+            replay = _Replay(items, keep_items)
+            if log is None:
+                return replay, _LogState(identity, replay)
+            header, header_end, raw, inode = log
+            consumed = replay.apply(raw)
+            return replay, _LogState(identity, replay, inode, header, header_end, header_end + consumed,
+                                     raw[:consumed].count(b"\n"))
+        with self._lock:
+            return self._read(keep_items, locked=True)
+
+    def load(self):
+        return self._read(keep_items=True, locked=False)[0].newest_first()
+
+    def stamp(self):
+        """Changes whenever the content changes, but not when a compaction only folds the log."""
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            return ("snapshot", _file_stamp(self.path))
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached_key, stamp = self._stamp_cache
+        if cached_key != key:
+            log = self._read_log()
+            if log is None or log[0].get("base") != _identity(self.path):
+                stamp = ("snapshot", _file_stamp(self.path), key)
+            else:
+                header, header_end = log[0], log[1]
+                stamp = (header["epoch"], header["folded"] + st.st_size - header_end)
+            self._stamp_cache = (key, stamp)
+        return stamp
+
+    # --- Writing (all with the collection lock held) ---
+    def _new_log(self, base, epoch, folded, tail=b""):
+        """Atomically starts a log for snapshot base. Returns (header, header length, inode)."""
+        header = {"base": base, "epoch": epoch, "folded": folded}
+        line = json.dumps(header).encode("utf-8") + b"\n"
+        tmp_path = f"{self.log_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(line + tail)
+            inode = os.fstat(f.fileno()).st_ino
+        os.replace(tmp_path, self.log_path)
+        return header, len(line), inode
+
+    def _sync(self):
+        """Brings the in-memory id index up to date with the files."""
+        identity = _identity(self.path)
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            st = None
+        state = self._state
+        if state is None or state.identity != identity or (st and st.st_ino) != state.inode:
+            self._state = self._read(keep_items=False, locked=True)[1]
+            return
+        if st is None or st.st_size <= state.offset:
+            return
+        with open(self.log_path, "rb") as f:  # Records other processes appended.
+            f.seek(state.offset)
+            raw = f.read()
+        consumed = state.replay.apply(raw)
+        state.offset += consumed
+        state.records += raw[:consumed].count(b"\n")
+
+    def _append(self, records):
+        self._sync()
+        state = self._state
+        if state.header is None:  # No log for this snapshot yet.
+            state.header, state.header_end, state.inode = self._new_log(state.identity, os.urandom(8).hex(), 0)
+            state.offset = state.header_end
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            if f.tell() > state.offset:
+                data = b"\n" + data  # Terminate a torn line left by a crashed writer.
+            f.write(data)
+            state.offset = f.tell()
+        state.replay.apply(data)
+        state.records += len(records)
+        if state.records >= self.compact_after and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, name=f"compact-{os.path.basename(self.path)}", daemon=True).start()
+
+    def add(self, items):
+        with self._lock:
+            before = self.stamp()
+            self._append([{"add": list(items)}])
+            return before, self.stamp()
+
+    def remove(self, item_id):
+        with self._lock:
+            self._sync()
+            if str(item_id) not in self._state.replay.by_id:
+                return None
+            before = self.stamp()
+            self._append([{"del": item_id}])
+            return before, self.stamp()
+
+    def replace(self, items):
+        with self._lock:
+            _atomic_write(self.path, lambda f: json.dump(items, f, indent=4))
+            self._new_log(_identity(self.path), os.urandom(8).hex(), 0)
+            self._state = None
+
+    # --- Compaction ---
+    def compact(self):
+        """
+        Folds the log into a new snapshot. The snapshot is written without the
+        lock; records appended meanwhile are carried over into the new log.
+        """
+        try:
+            replay, state = self._read(keep_items=True, locked=False)
+            if state.header is None:
+                return
+            tmp_path = f"{self.path}.{os.getpid()}.compact.tmp"
+            items = replay.newest_first()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(items, f, indent=4)
+            with self._lock:
+                try:
+                    st = os.stat(self.log_path)
+                except OSError:
+                    st = None
+                if _identity(self.path) != state.identity or st is None or st.st_ino != state.inode:
+                    os.remove(tmp_path)  # Replaced or compacted by someone else meanwhile.
+                    return
+                with open(self.log_path, "rb") as f:
+                    f.seek(state.offset)
+                    tail = f.read()
+                os.replace(tmp_path, self.path)
+                # Folded bytes grow by exactly what the new log lost, so stamp() does not move.
+                folded = state.header["folded"] + state.offset - state.header_end
+                header, header_end, inode = self._new_log(_identity(self.path), state.header["epoch"], folded, tail)
+                replay.items = None  # Only the id index is kept.
+                consumed = replay.apply(tail)
+                self._state = _LogState(_identity(self.path), replay, inode, header, header_end,
+                                        header_end + consumed, tail[:consumed].count(b"\n"))
+            logging.info(f"Compacted '{self.path}' to {len(items)} items.")
+        except OSError as e:
+            logging.error(f"Compaction of '{self.path}' failed: {e}")
+        finally:
+            self._compacting = False
+
+
+# --- FLAT FILE BACKEND ---
+class FileStorage:
+    """The original layout: a pipe-delimited text file and one JSON list per collection."""
+
+    def __init__(self, video_file=VIDEO_FILE, collection_files=None, features_file=FEATURES_FILE):
+        self.video_file = video_file
+        self.features_file = features_file
+        self.collection_files = dict(collection_files or COLLECTION_FILES)
+        self._video_lock = ProcessLock(video_file + ".lock")
+        self._features_lock = ProcessLock(features_file + ".lock")
+        self._collection_locks = {name: ProcessLock(path + ".lock") for name, path in self.collection_files.items()}
+        self._collection_logs = {name: _CollectionLog(path, self._collection_locks[name])
+                                 for name, path in self.collection_files.items()}
+
+    # Videos
+    def video_stamp(self):
+        return _file_stamp(self.video_file)
+
+    def load_videos(self):
+        if not os.path.exists(self.video_file):
+            return []
+        return parse_video_file(self.video_file)
+
+    def append_videos(self, records):
+        with self._video_lock, open(self.video_file, "a", encoding="utf-8") as f:
+            f.write("".join(format_video_line(r) for r in records))
+
+    def remove_video(self, link):
+        if not os.path.exists(self.video_file):
+            return False
+        with self._video_lock:
+            lines_to_keep, removed = [], False
+            with open(self.video_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.strip().rsplit(' | ', 2)
+                    if len(parts) == 3 and parts[2] == link:
+                        removed = True
+                    else:
+                        lines_to_keep.append(line)
+            if removed:
+                _atomic_write(self.video_file, lambda f: f.writelines(lines_to_keep))
+        return removed
+
+    def replace_videos(self, records, known_links=None):
+        """
+        Replaces all videos. known_links (the links a long job started from)
+        merges in concurrent adds and deletes, see _merge_since.
+        """
+        with self._video_lock:
+            if known_links is not None:
+                records = _merge_since(records, self.load_videos(), known_links)
+            _atomic_write(self.video_file, lambda f: f.writelines(format_video_line(r) for r in records))
+
+    # Raw features (one JSON object per line, the last line for a link wins)
+    def save_features(self, features):
+        lines = "".join(json.dumps(f, separators=(",", ":")) + "\n" for f in features)
+        with self._features_lock, open(self.features_file, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def load_features(self):
+        features = {}
+        if not os.path.exists(self.features_file):
+            return features
+        with open(self.features_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                features[record["link"]] = record
+        return features
+
+    # Gallery / reddit collections (lists of dicts, newest first): a JSON snapshot
+    # plus an append log, see _CollectionLog.
+    def load_items(self, collection):
+        try:
+            return self._collection_logs[collection].load()
+        except IOError: return []
+
+    def items_stamp(self, collection):
+        return self._collection_logs[collection].stamp()
+
+    def replace_items(self, collection, items):
+        self._collection_logs[collection].replace(items)
+
+    def add_items(self, collection, items):
+        """Returns the (before, after) stamps of this write, both taken under the collection lock."""
+        return self._collection_logs[collection].add(items)
+
+    def remove_item(self, collection, item_id):
+        """Returns the (before, after) stamps of the delete, or None if the item was not found."""
+        return self._collection_logs[collection].remove(item_id)
+
+    def compact_items(self, collection):
+        """Folds the collection's log into its JSON file now (e.g. before running an old script on it)."""
+        self._collection_logs[collection].compact()
+
+
+# --- SQLITE BACKEND ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    link TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS video_tags (
+    tag TEXT NOT NULL,
+    video_seq INTEGER NOT NULL,
+    PRIMARY KEY (tag, video_seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS video_tags_by_video ON video_tags (video_seq);
+
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    source_url TEXT,
+    subreddit TEXT,
+    data TEXT NOT NULL,
+    UNIQUE (collection, id)
+);
+CREATE INDEX IF NOT EXISTS items_by_source_url ON items (collection, source_url);
+CREATE INDEX IF NOT EXISTS items_by_subreddit ON items (collection, subreddit);
+CREATE TABLE IF NOT EXISTS item_tags (
+    tag TEXT NOT NULL,
+    item_seq INTEGER NOT NULL,
+    PRIMARY KEY (tag, item_seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS item_tags_by_item ON item_tags (item_seq);
+
+CREATE TABLE IF NOT EXISTS video_features (
+    link TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteStorage:
+    """All three collections in one SQLite database in WAL mode, one connection per thread."""
+
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # SQLite connections must not be shared across fork; children open their own.
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, key):
+        # Called inside the write transaction, so the returned value is exactly this write's stamp.
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _stamp(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    # Videos
+    def video_stamp(self):
+        return self._stamp("videos")
+
+    def load_videos(self):
+        rows = self._connect().execute("SELECT title, tags, link FROM videos ORDER BY seq")
+        return [VideoRecord(title, tuple(tags.split(',')), link) for title, tags, link in rows]
+
+    def replace_videos(self, records, known_links=None):
+        """
+        Replaces all videos. known_links (the links a long job started from)
+        merges in concurrent adds and deletes, see _merge_since.
+        """
+        conn = self._connect()
+        with conn:
+            if known_links is not None:
+                conn.execute("BEGIN IMMEDIATE")  # Take the write lock before reading what to merge.
+                records = _merge_since(records, self.load_videos(), known_links)
+            conn.execute("DELETE FROM video_tags")
+            conn.execute("DELETE FROM videos")
+            self._insert_videos(conn, records)
+            self._bump(conn, "videos")
+
+    def save_features(self, features):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO video_features (link, data) VALUES (?, ?)",
+                [(f["link"], json.dumps(f)) for f in features])
+
+    def load_features(self):
+        rows = self._connect().execute("SELECT link, data FROM video_features")
+        return {link: json.loads(data) for link, data in rows}
+
+    def _insert_videos(self, conn, records):
+        for r in records:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO videos (link, title, tags) VALUES (?, ?, ?)",
+                (r.link, r.title, ','.join(r.tags)))
+            if cur.rowcount:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO video_tags (tag, video_seq) VALUES (?, ?)",
+                    [(tag, cur.lastrowid) for tag in r.tags if tag])
+
+    def append_videos(self, records):
+        conn = self._connect()
+        with conn:
+            self._insert_videos(conn, records)
+            self._bump(conn, "videos")
+
+    def remove_video(self, link):
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT seq FROM videos WHERE link = ?", (link,)).fetchone()
+            if not row:
+                return False
+            conn.execute("DELETE FROM video_tags WHERE video_seq = ?", row)
+            conn.execute("DELETE FROM videos WHERE seq = ?", row)
+            self._bump(conn, "videos")
+        return True
+
+    # Gallery / reddit collections
+    def items_stamp(self, collection):
+        return self._stamp(collection)
+
+    def load_items(self, collection):
+        rows = self._connect().execute(
+            "SELECT data FROM items WHERE collection = ? ORDER BY seq DESC", (collection,))
+        return [json.loads(data) for (data,) in rows]
+
+    def _insert_items(self, conn, collection, items):
+        # Lists are newest first, so insert in reverse to keep seq ascending with age.
+        for item in reversed(list(items)):
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO items (collection, id, source_url, subreddit, data) VALUES (?, ?, ?, ?, ?)",
+                (collection, str(item.get("id")), item.get("source_url"), item.get("subreddit"), json.dumps(item)))
+            if cur.rowcount:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO item_tags (tag, item_seq) VALUES (?, ?)",
+                    [(tag, cur.lastrowid) for tag in item.get("tags", []) if tag])
+        return self._bump(conn, collection)
+
+    def add_items(self, collection, items):
+        """Returns the (before, after) stamps of this write, read inside its transaction."""
+        conn = self._connect()
+        with conn:
+            after = self._insert_items(conn, collection, items)
+        return after - 1, after
+
+    def replace_items(self, collection, items):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM item_tags WHERE item_seq IN (SELECT seq FROM items WHERE collection = ?)", (collection,))
+            conn.execute("DELETE FROM items WHERE collection = ?", (collection,))
+            self._insert_items(conn, collection, items)
+
+    def remove_item(self, collection, item_id):
+        """Returns the (before, after) stamps of the delete, or None if the item was not found."""
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT seq FROM items WHERE collection = ? AND id = ?", (collection, str(item_id))).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM item_tags WHERE item_seq = ?", row)
+            conn.execute("DELETE FROM items WHERE seq = ?", row)
+            after = self._bump(conn, collection)
+        return after - 1, after
+
+
+# --- BACKEND SELECTION ---
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Returns the process-wide storage backend named by STORAGE_BACKEND ("files" or "sqlite")."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            backend = os.environ.get("STORAGE_BACKEND", "files").lower()
+            if backend == "sqlite":
+                _storage = SQLiteStorage(os.environ.get("STORAGE_DATABASE", DATABASE_FILE))
+            elif backend == "files":
+                _storage = FileStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'files' or 'sqlite').")
+            logging.info(f"Using {type(_storage).__name__} for videos, gallery and reddit data.")
+        return _storage
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["--compact"]:
+        print("Usage: python storage.py --compact   (folds the gallery/reddit append logs into their JSON files)")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    files = FileStorage()
+    for name in files.collection_files:
+        files.compact_items(name)
@@ -0,0 +1,121 @@
+# thumbnail_resolver.py
+
+"""
+Long-lived background thumbnail resolver.
+Links are put on a deduplicating work queue and resolved by a small pool of
+daemon threads, so request handlers never wait on upstream pages.
+
+With several worker processes, a claim file makes sure only one of them runs
+the pool: the first process to enqueue takes a non-blocking flock on it and
+keeps it for life. The other processes drop what they enqueue (retrying the
+claim now and then, so one of them takes over if the owner exits), and the
+owner instead picks up their links by calling scan() periodically.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: the dev server is a single process anyway.
+    fcntl = None
+
+SCAN_INTERVAL = float(os.environ.get("THUMBNAIL_SCAN_INTERVAL", 2))  # seconds
+
+
+class ThumbnailResolver:
+    """Resolves links in the background; each link is queued at most once at a time."""
+
+    def __init__(self, resolve, workers=4, claim_path=None, scan=None, scan_interval=SCAN_INTERVAL):
+        self._resolve = resolve
+        self._workers = workers
+        self._claim_path = claim_path
+        self._scan = scan  # Called every scan_interval in the owning process to queue other processes' work.
+        self._scan_interval = scan_interval
+        self._claim_fd = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Worker threads do not survive a fork, so a forked child starts with an empty pool,
+        # and it does not own the parent's claim.
+        if self._claim_fd is not None:
+            os.close(self._claim_fd)  # The parent's descriptor keeps the flock.
+        self._claim_fd = None
+        self._next_claim = 0.0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _claim(self):
+        if self._claim_path is None or fcntl is None:
+            return True
+        now = time.monotonic()
+        if now < self._next_claim:
+            return False
+        self._next_claim = now + self._scan_interval
+        fd = os.open(self._claim_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._claim_fd = fd  # Held until the process exits.
+        logging.info(f"Process {os.getpid()} runs the background thumbnail resolver.")
+        return True
+
+    def _ensure_started(self):
+        # Threads are started lazily so the resolver is safe to create at import time
+        # (and in a preloading master). Returns False if another process owns the pool.
+        if self._threads:
+            return True
+        if not self._claim():
+            return False
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f"thumbnail-resolver-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self._scan is not None:
+            thread = threading.Thread(target=self._run_scans, name="thumbnail-resolver-scan", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return True
+
+    def enqueue(self, links):
+        """
+        Queues any links that are not already pending. Returns how many were
+        added; always 0 in a process that does not own the resolver.
+        """
+        added = 0
+        with self._lock:
+            if not self._ensure_started():
+                return 0
+            for link in links:
+                if link not in self._pending:
+                    self._pending.add(link)
+                    self._queue.put(link)
+                    added += 1
+        return added
+
+    def _run_scans(self):
+        while True:
+            time.sleep(self._scan_interval)
+            try:
+                self._scan()
+            except Exception as e:
+                logging.error(f"Thumbnail resolver scan failed: {e}")
+
+    def _run(self):
+        while True:
+            link = self._queue.get()
+            try:
+                self._resolve(link)
+            except Exception as e:
+                logging.warning(f"Background thumbnail resolve failed for {link}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(link)
+                self._queue.task_done()
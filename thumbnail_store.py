@@ -0,0 +1,223 @@
+# thumbnail_store.py
+
+"""
+Journaled thumbnail cache.
+The cache lives in memory as a plain dict. Changes are buffered and appended
+to a journal as compact one-line records; a background compaction rewrites
+the JSON snapshot and starts a fresh journal. Startup loads snapshot + journal.
+
+Several processes (gunicorn workers) can share one store: journal appends and
+compaction hold a cross-process lock, and sync() tails the journal so each
+process picks up entries written by the others.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from process_lock import ProcessLock
+
+
+def _encode(records):
+    return "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode("utf-8")
+
+
+def _apply(data, raw, skip=()):
+    """Applies complete journal lines from raw bytes to data. Returns the bytes consumed."""
+    end = raw.rfind(b"\n") + 1  # A partially written final line is left for the next read.
+    for line in raw[:end].splitlines():
+        try:
+            link, thumb = json.loads(line)
+        except (ValueError, TypeError):
+            continue  # A torn line from a crash is simply dropped.
+        if link in skip:
+            continue
+        if thumb is None:
+            data.pop(link, None)
+        else:
+            data[link] = thumb
+    return end
+
+
+class ThumbnailStore:
+    """link -> thumbnail URL map backed by a JSON snapshot and an append-only journal."""
+
+    def __init__(self, path, flush_delay=0.5, compact_after=5000):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.flush_delay = flush_delay
+        self.compact_after = compact_after
+        self.data = {}
+        self.version = 0  # Bumped on every change so callers can reuse derived output.
+        self._process_lock = ProcessLock(path + ".lock")
+        self._position = None  # (snapshot mtime, journal inode, bytes of journal applied)
+        self._journal_records = 0
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self):
+        # Also run in forked children: timers and lock owners do not survive a fork.
+        self._buffer = []
+        self._flush_timer = None
+        self._compacting = False
+        self._lock = threading.Lock()     # Guards data, version and the write buffer.
+        self._io_lock = threading.Lock()  # Serializes journal I/O within this process.
+        self._sync_lock = threading.Lock()
+
+    # --- Loading ---
+    def _snapshot_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_disk(self):
+        """Reads snapshot + journal. Returns (data, journal records, position)."""
+        data = {}
+        snapshot_mtime = self._snapshot_mtime()
+        if snapshot_mtime is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    logging.warning(f"Thumbnail snapshot '{self.path}' is corrupted; starting from the journal.")
+                    data = {}
+        inode, consumed, records = None, 0, 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                raw = f.read()
+            consumed = _apply(data, raw)
+            records = raw[:consumed].count(b"\n")
+        return data, records, (snapshot_mtime, inode, consumed)
+
+    def load(self):
+        """Loads the snapshot, then replays the journal on top."""
+        data, records, position = self._read_disk()
+        with self._lock:
+            for link, thumb in self._buffer:  # Keep unflushed local changes.
+                if thumb is None:
+                    data.pop(link, None)
+                else:
+                    data[link] = thumb
+            self.data.clear()
+            self.data.update(data)
+            self._journal_records = records
+            self._position = position
+            self.version += 1
+        return self.data
+
+    def sync(self):
+        """
+        Picks up entries other processes appended since the last call; reloads
+        fully if the snapshot was compacted. Costs two stats when nothing changed.
+        """
+        with self._sync_lock:
+            if self._position is None:
+                self.load()
+                return
+            snapshot_mtime, inode, offset = self._position
+            try:
+                st = os.stat(self.journal_path)
+            except OSError:
+                st = None
+            if self._snapshot_mtime() != snapshot_mtime or (st and st.st_ino != inode and inode is not None):
+                self.load()
+                return
+            if st is None or st.st_size <= offset:
+                return
+            with open(self.journal_path, "rb") as f:
+                f.seek(offset)
+                raw = f.read()
+            with self._lock:
+                pending = {link for link, _ in self._buffer}
+                consumed = _apply(self.data, raw, skip=pending)
+                if consumed:
+                    self._position = (snapshot_mtime, st.st_ino, offset + consumed)
+                    self.version += 1
+
+    # --- Reads ---
+    def __contains__(self, link):
+        return link in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, link, default=None):
+        return self.data.get(link, default)
+
+    # --- Writes ---
+    def set(self, link, thumb):
+        with self._lock:
+            if self.data.get(link) == thumb:
+                return
+            self.data[link] = thumb
+            self.version += 1
+            self._buffer.append((link, thumb))
+            self._schedule_flush()
+
+    def delete(self, link):
+        with self._lock:
+            if link not in self.data:
+                return False
+            del self.data[link]
+            self.version += 1
+            self._buffer.append((link, None))
+            self._schedule_flush()
+        return True
+
+    def _schedule_flush(self):
+        # Called with self._lock held: one timer per burst, so bursts coalesce into one append.
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _take_buffer(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        return records
+
+    def flush(self):
+        """Appends all buffered changes to the journal in a single write."""
+        with self._io_lock:
+            records = self._take_buffer()
+            if records:
+                with self._process_lock, open(self.journal_path, "ab") as f:
+                    f.write(_encode(records))
+                self._journal_records += len(records)
+            needs_compaction = self._journal_records >= self.compact_after and not self._compacting
+            if needs_compaction:
+                self._compacting = True
+        if needs_compaction:
+            threading.Thread(target=self.compact, name="thumbnail-compaction", daemon=True).start()
+
+    # --- Compaction ---
+    def compact(self):
+        """
+        Rewrites the snapshot and removes the journal. The snapshot is built from
+        disk, not memory, so entries journaled by other processes are kept.
+        """
+        try:
+            with self._io_lock, self._process_lock:
+                records = self._take_buffer()
+                if records:
+                    with open(self.journal_path, "ab") as f:
+                        f.write(_encode(records))
+                snapshot, _, _ = self._read_disk()
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._journal_records = 0
+            self.load()
+            logging.info(f"Compacted thumbnail cache to {len(snapshot)} entries.")
+        finally:
+            self._compacting = False
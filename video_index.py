@@ -0,0 +1,165 @@
+# video_index.py
+
+"""
+Process-wide, in-memory index of the classified videos.
+The storage backend is read once and only re-read when its change stamp
+(file mtime/size, or the database change counter) moves, or after a route
+that wrote to it calls invalidate(). Alongside the
+records it keeps an inverted index from each classification tag to the
+positions of the videos carrying it, used for filtering and tag facets.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from collections import namedtuple
+
+# Compact per-video record: tuples instead of dicts, interned tag strings.
+VideoRecord = namedtuple("VideoRecord", ["title", "tags", "link"])
+
+
+def parse_video_line(line):
+    """Parses one 'title | tag1,tag2 | link' line into a VideoRecord, or None if it is malformed."""
+    parts = line.strip().rsplit(' | ', 2)
+    if len(parts) != 3:
+        return None
+    title, tags_str, link = parts
+    return VideoRecord(title, tuple(sys.intern(tag.strip()) for tag in tags_str.split(',')), link)
+
+
+def parse_video_file(path):
+    """Parses 'title | tag1,tag2 | link' lines into VideoRecords."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = parse_video_line(line)
+            if record:
+                records.append(record)
+            elif line.strip():
+                logging.warning(f"Skipping malformed line: {line.strip()}")
+    return records
+
+
+def build_tag_index(records):
+    """Maps each tag to the ascending list of record positions carrying it."""
+    tag_positions = {}
+    for pos, record in enumerate(records):
+        for tag in record.tags:
+            if tag:
+                tag_positions.setdefault(tag, []).append(pos)
+    return tag_positions
+
+
+class VideoIndex:
+    """Holds the parsed video file, its tag index and a pre-serialized /videos response."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        # (records, links, tag_positions, search_texts), swapped as one unit on reload.
+        self._snapshot = ([], frozenset(), {}, [])
+        self.version = 0
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._json = (None, None)
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        # The parsed snapshot is kept across fork (shared copy-on-write); only the lock is renewed.
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reloads the videos only if the storage changed since the last load."""
+        stamp = self.storage.video_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return
+        with self._lock:
+            stamp = self.storage.video_stamp()
+            if stamp is not None and stamp == self._stamp:
+                return
+            try:
+                records = self.storage.load_videos()
+            except Exception as e:
+                logging.error(f"Could not load videos: {e}")
+                records = []
+            self._snapshot = (
+                records,
+                frozenset(r.link for r in records),
+                build_tag_index(records),
+                [f"{r.title} {' '.join(r.tags)}".lower() for r in records],
+            )
+            self._stamp = stamp
+            self.version += 1
+            logging.info(f"Video index loaded {len(records)} videos (version {self.version}).")
+
+    def invalidate(self):
+        """Forces a reload on the next access, e.g. after /add or /remove."""
+        with self._lock:
+            self._stamp = None
+
+    def get_records(self):
+        self.refresh()
+        return self._snapshot[0]
+
+    def get_links(self):
+        self.refresh()
+        return self._snapshot[1]
+
+    def to_json(self, thumb_lookup, thumbs_version, default_thumb):
+        """
+        Returns (body, missing): the serialized video list with thumbnails, and
+        the links that had no thumbnail. Both are reused until either the index
+        or the thumbnail cache changes; missing is None for a reused body, as
+        those links were already reported by the call that built it.
+        """
+        self.refresh()
+        key = (self.version, thumbs_version)
+        cached_key, body = self._json
+        if cached_key == key:
+            return body, None
+        videos, missing = [], []
+        for r in self._snapshot[0]:
+            thumb = thumb_lookup(r.link)
+            if thumb is None:
+                missing.append(r.link)
+            videos.append({"title": r.title, "tags": list(r.tags), "link": r.link,
+                           "thumb": thumb or default_thumb})
+        body = json.dumps(videos, separators=(",", ":")).encode("utf-8")
+        self._json = (key, body)
+        return body, missing
+
+    def query(self, tags=(), search_query="", start=0, limit=50):
+        """
+        Filters by exact tags (all must match) and by whitespace-separated
+        search terms (substring of title or tags). Returns the requested slice,
+        newest first, plus the total match count and per-tag counts of the matches.
+        """
+        self.refresh()
+        records, _, tag_positions, search_texts = self._snapshot
+        terms = search_query.lower().split()
+
+        if not tags and not terms:
+            total = len(records)
+            end = max(total - start, 0)
+            page = records[max(end - limit, 0):end][::-1]
+            counts = {tag: len(positions) for tag, positions in tag_positions.items()}
+            return page, total, counts
+
+        if tags:
+            postings = sorted((tag_positions.get(tag, []) for tag in tags), key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                matches.intersection_update(posting)
+            positions = sorted(matches, reverse=True)
+        else:
+            positions = range(len(records) - 1, -1, -1)
+        if terms:
+            positions = [p for p in positions if all(t in search_texts[p] for t in terms)]
+
+        counts = {}
+        for p in positions:
+            for tag in records[p].tags:
+                if tag:
+                    counts[tag] = counts.get(tag, 0) + 1
+        page = [records[p] for p in positions[start:start + limit]]
+        return page, len(positions), counts
@@ -1,67 +1,42 @@
 import logging
-import json
-import os
-import re
-import threading
-from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from bs4 import BeautifulSoup
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
-from classification_logic import classify_video
+import metrics
+from batch_ingest import ingest_batch
+from classification_cache import get_classification_cache
+from page_extract import extract_page, fetch_og_image
+from storage import get_storage, make_features
+from thumbnail_resolver import ThumbnailResolver
+from thumbnail_store import ThumbnailStore
+from video_index import VideoIndex, VideoRecord
 
 # Create a Blueprint object
 video_bp = Blueprint('video', __name__)
 
 # --- CONFIGURATION AND STATE ---
-VIDEO_FILE = "classified_videos.txt"
 CACHE_FILE = "thumbnail_cache.json"
-THUMBNAIL_CACHE = {}
-cache_lock = threading.Lock()
-
-REQUEST_HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+THUMBNAIL_STORE = ThumbnailStore(CACHE_FILE)
+THUMBNAIL_CACHE = THUMBNAIL_STORE.data  # Read-only view; all writes go through THUMBNAIL_STORE.
+ERROR_THUMB = "https://via.placeholder.com/320x180?text=Error"
+LOADING_THUMB = "https://via.placeholder.com/320x180?text=Loading..."
+STORAGE = get_storage()
+VIDEO_INDEX = VideoIndex(STORAGE)
+CLASSIFICATION_CACHE = get_classification_cache()
 
 logging.basicConfig(level=logging.INFO)
 
 
 # --- HELPER FUNCTIONS ---
 def fetch_video_details(url):
-    """Fetches metadata for a given video URL."""
+    """
+    Fetches metadata for a given video URL. The page is downloaded and parsed once
+    and cached briefly, so a following thumbnail lookup reuses it.
+    """
     try:
-        response = requests.get(url, timeout=15, headers=REQUEST_HEADERS)
-        response.raise_for_status()
-        final_url = response.url
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        title_tag = soup.find("title")
-        title = "Untitled"
-        if title_tag:
-            title = title_tag.text.strip().replace(" - Pornhub.com", "").strip()
-
-        channel_name = "Unknown Channel"
-        channel_link = soup.select_one('a[data-mx-cat="Uploader"]')
-        if channel_link:
-            channel_name = channel_link.text.strip()
-
-        # Actor and tag scraping logic...
-        male_actors, female_actors, trans_actors = set(), set(), set()
-        actor_wrapper = soup.select_one("div.pornstarsWrapper")
-        if actor_wrapper:
-            actor_links = actor_wrapper.find_all('a', href=re.compile(r'/pornstar/'))
-            for link in actor_links:
-                actor_name = link.text.strip()
-                if not actor_name: continue
-                aria_label = link.get('aria-label', '').lower()
-                if 'female pornstar' in aria_label: female_actors.add(actor_name)
-                elif 'male pornstar' in aria_label: male_actors.add(actor_name)
-                elif 'transgender pornstar' in aria_label: trans_actors.add(actor_name)
-
-        tag_elements = soup.find_all("a", href=re.compile(r"/video/search\?search=|/tag/"))
-        scraped_tags = {tag.text.strip().lower() for tag in tag_elements if tag.text.strip()}
-        return title, channel_name, scraped_tags, list(male_actors), list(female_actors), list(trans_actors), final_url
+        info = extract_page(url)
+        return info.title, info.channel, info.tags, info.male_actors, info.female_actors, info.trans_actors, info.final_url
     except requests.exceptions.RequestException as e:
         logging.warning(f"Failed to fetch details from {url}: {e}")
         return "Untitled", "Unknown Channel", set(), [], [], [], url
@@ -69,131 +44,190 @@ def fetch_video_details(url):
 
 def get_or_generate_thumbnail(link):
     """Gets a thumbnail from the cache or generates it. This function is thread-safe."""
-    with cache_lock:
-        if link in THUMBNAIL_CACHE:
-            return
+    if link in THUMBNAIL_STORE:
+        return
 
-    # This part runs if the thumbnail is not in the cache
-    thumb_url = "https://via.placeholder.com/320x180?text=Error"
+    # This part runs if the thumbnail is not in the cache. Only the page <head> is
+    # streamed, or a recently extracted page is reused.
+    thumb_url = ERROR_THUMB
     try:
-        response = requests.get(link, timeout=10, headers=REQUEST_HEADERS)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        thumb_tag = soup.find("meta", property="og:image")
-        if thumb_tag and thumb_tag.get("content"):
-            thumb_url = thumb_tag.get("content")
+        og_image = fetch_og_image(link, timeout=10)
+        if og_image:
+            thumb_url = og_image
     except requests.exceptions.RequestException as e:
         logging.warning(f"Thumbnail fetch failed for {link}: {e}")
 
-    with cache_lock:
-        THUMBNAIL_CACHE[link] = thumb_url
+    THUMBNAIL_STORE.set(link, thumb_url)
     return
 
 
 def load_cache():
-    """Loads the thumbnail cache from a file at startup."""
-    global THUMBNAIL_CACHE
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            try:
-                THUMBNAIL_CACHE = json.load(f)
-            except json.JSONDecodeError:
-                THUMBNAIL_CACHE = {}
-    logging.info(f"Loaded {len(THUMBNAIL_CACHE)} thumbnail items from cache.")
+    """Loads the thumbnail cache (snapshot plus journal) at startup."""
+    THUMBNAIL_STORE.load()
+    logging.info(f"Loaded {len(THUMBNAIL_STORE)} thumbnail items from cache.")
 
 
 def save_cache():
-    """Saves the current thumbnail cache to a file."""
-    with cache_lock:
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(THUMBNAIL_CACHE, f, indent=4)
+    """Flushes any buffered thumbnail changes to the cache journal."""
+    THUMBNAIL_STORE.flush()
 
 
 def parse_videos():
-    """Parses the video data file."""
-    videos = []
-    if not os.path.exists(VIDEO_FILE):
-        return []
-    try:
-        with open(VIDEO_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().rsplit(' | ', 2)
-                if len(parts) == 3:
-                    title, tags_str, link = parts
-                    videos.append({"title": title, "tags": [tag.strip() for tag in tags_str.split(',')], "link": link})
-                elif line.strip():
-                    logging.warning(f"Skipping malformed line: {line.strip()}")
-    except Exception as e:
-        logging.error(f"Could not read video file '{VIDEO_FILE}': {e}")
-        return []
-    return videos
+    """Returns the video list as dicts, served from the in-memory index."""
+    return [{"title": r.title, "tags": list(r.tags), "link": r.link} for r in VIDEO_INDEX.get_records()]
 
 
-# --- FLASK ROUTES ---
-@video_bp.route("/videos")
-def get_videos():
+_scanned = None  # (index version, thumbnail store version) of the last scan
+
+
+def queue_missing_thumbnails():
     """
-    FIXED: Reintroduces parallel fetching for missing thumbnails to prevent server timeouts,
-    while enriching the video data correctly from the cache.
+    Periodic scan in the process that owns the resolver: queues every video
+    still without a thumbnail, including those other workers only saw.
+    Skipped while neither the videos nor the thumbnails changed.
     """
-    try:
-        videos = parse_videos()
-        links = [v['link'] for v in videos]
+    global _scanned
+    THUMBNAIL_STORE.sync()
+    records = VIDEO_INDEX.get_records()
+    key = (VIDEO_INDEX.version, THUMBNAIL_STORE.version)
+    if key == _scanned:
+        return
+    _scanned = key
+    THUMBNAIL_RESOLVER.enqueue([r.link for r in records if r.link not in THUMBNAIL_CACHE])
+
 
-        # Use the ThreadPoolExecutor to fetch any missing thumbnails in parallel.
-        # This is fast and prevents timeouts.
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            executor.map(get_or_generate_thumbnail, links)
+# Resolves missing thumbnails off the request path; the store coalesces the resulting writes.
+# Only one gunicorn worker runs it (see thumbnail_resolver.py); the others' enqueues are dropped.
+THUMBNAIL_RESOLVER = ThumbnailResolver(get_or_generate_thumbnail, workers=10,
+                                       claim_path=CACHE_FILE + ".resolver.lock", scan=queue_missing_thumbnails)
 
-        # Now that the cache is populated, enrich the video objects.
-        for video in videos:
-            video['thumb'] = THUMBNAIL_CACHE.get(video['link'], "https://via.placeholder.com/320x180?text=Error")
 
-        save_cache()  # Save any newly fetched thumbnails to the file.
+def enqueue_missing_thumbnails(links):
+    """Queues any links not yet in the thumbnail cache for background resolution."""
+    missing = [link for link in links if link not in THUMBNAIL_CACHE]
+    metrics.THUMBNAIL_LOOKUPS.inc(len(links) - len(missing), "hit")
+    metrics.THUMBNAIL_LOOKUPS.inc(len(missing), "miss")
+    if missing:
+        THUMBNAIL_RESOLVER.enqueue(missing)
 
-        return jsonify(videos)
+
+# --- FLASK ROUTES ---
+@video_bp.route("/videos")
+def get_videos():
+    """
+    Serves the video list from the in-memory index. With any of page/offset/limit/tag/q
+    it returns one page (newest first) with the total and per-tag counts of the
+    matches; without them it returns the full list, reusing the serialized body.
+    Unresolved thumbnails come back as a placeholder and are resolved in the
+    background; clients pick them up from /thumbnails.
+    """
+    try:
+        THUMBNAIL_STORE.sync()  # Pick up thumbnails other worker processes resolved.
+        if not any(arg in request.args for arg in ("page", "offset", "limit", "tag", "q")):
+            # The missing-thumbnail scan runs only when the body is rebuilt, not on every request.
+            body, missing = VIDEO_INDEX.to_json(THUMBNAIL_STORE.get, THUMBNAIL_STORE.version, LOADING_THUMB)
+            if missing is not None:
+                metrics.THUMBNAIL_LOOKUPS.inc(len(VIDEO_INDEX.get_records()) - len(missing), "hit")
+                metrics.THUMBNAIL_LOOKUPS.inc(len(missing), "miss")
+                if missing:
+                    THUMBNAIL_RESOLVER.enqueue(missing)
+            return Response(body, mimetype="application/json")
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        # An explicit offset wins over page, so a client that removed items keeps its place.
+        offset = max(request.args.get('offset', (page - 1) * limit, type=int), 0)
+        tags = [tag for tag in request.args.getlist('tag') if tag]
+        search_query = request.args.get('q', '').strip()
+
+        records, total, tag_counts = VIDEO_INDEX.query(tags, search_query, offset, limit)
+        enqueue_missing_thumbnails([r.link for r in records])
+        items = []
+        for r in records:
+            thumb = THUMBNAIL_CACHE.get(r.link)
+            items.append({"title": r.title, "tags": list(r.tags), "link": r.link,
+                          "thumb": thumb or LOADING_THUMB, "thumb_pending": thumb is None})
+        return jsonify({
+            "items": items, "total": total,
+            "page": page, "offset": offset, "limit": limit, "tags": tag_counts
+        })
     except Exception as e:
         logging.error(f"An error occurred in /videos endpoint: {e}", exc_info=True)
         return jsonify({"error": "An internal server error occurred."}), 500
 
 
+@video_bp.route("/thumbnails", methods=["POST"])
+def get_thumbnails():
+    """
+    Lightweight poll for thumbnails resolved in the background. Takes {"links": [...]}
+    and returns the resolved ones plus the links still pending.
+    """
+    data = request.json or {}
+    links = data.get("links")
+    if not isinstance(links, list):
+        return jsonify({"error": "A list of links is required."}), 400
+
+    THUMBNAIL_STORE.sync()
+    known_links = VIDEO_INDEX.get_links()
+    thumbs, pending = {}, []
+    for link in links[:500]:
+        thumb = THUMBNAIL_CACHE.get(link)
+        if thumb is not None:
+            thumbs[link] = thumb
+        elif link in known_links:
+            pending.append(link)
+    # Re-queue anything that dropped out of the queue, e.g. after a restart.
+    THUMBNAIL_RESOLVER.enqueue(pending)
+    metrics.THUMBNAIL_LOOKUPS.inc(len(thumbs), "hit")
+    metrics.THUMBNAIL_LOOKUPS.inc(len(pending), "miss")
+    return jsonify({"thumbs": thumbs, "pending": pending})
+
+
 @video_bp.route("/add", methods=["POST"])
 def add_video():
     """Adds new videos to the list."""
-    # This function remains correct.
     data = request.json
     urls = data.get("urls")
     if not urls or not isinstance(urls, list):
         return jsonify({"error": "A list of URLs is required."}), 400
 
-    results = []
-    existing_links = {v['link'] for v in parse_videos()}
-    any_success = False
-
-    with open(VIDEO_FILE, "a", encoding="utf-8") as f:
-        for url in urls:
-            try:
-                title, channel, scraped_tags, males, females, trans, final_url = fetch_video_details(url)
-                if title == "Untitled":
-                    raise Exception("Failed to fetch video details")
-                if final_url in existing_links:
-                    results.append({"status": "duplicate", "url": final_url})
-                    continue
-
-                final_tags = classify_video(title, channel, scraped_tags, males, females, trans)
-                entry = f"{title} | {','.join(final_tags)} | {final_url}\n"
-                f.write(entry)
-                get_or_generate_thumbnail(final_url)
-
-                results.append({"status": "success", "title": title, "final_url": final_url})
-                existing_links.add(final_url)
-                any_success = True
-            except Exception as e:
-                logging.error(f"Error processing url {url}: {e}")
-                results.append({"status": "error", "url": url, "reason": str(e)})
-
-    if any_success:
-        save_cache()
+    results, new_records, new_features = [], [], []
+    existing_links = set(VIDEO_INDEX.get_links())
+
+    # Fetch every new URL in parallel (capped per host), then classify in input order.
+    to_fetch = list(dict.fromkeys(url for url in urls if url not in existing_links))
+    fetched = {url: (details, error) for url, details, error in ingest_batch(to_fetch, fetch_video_details)}
+
+    for url in urls:
+        if url not in fetched:
+            results.append({"status": "duplicate", "url": url})
+            continue
+        try:
+            details, error = fetched[url]
+            if error: raise error
+            title, channel, scraped_tags, males, females, trans, final_url = details
+            if title == "Untitled":
+                raise Exception("Failed to fetch video details")
+            if final_url in existing_links:
+                results.append({"status": "duplicate", "url": final_url})
+                continue
+
+            final_tags = CLASSIFICATION_CACHE.classify(title, channel, scraped_tags, males, females, trans)
+            new_records.append(VideoRecord(title, tuple(final_tags), final_url))
+            new_features.append(make_features(final_url, title, channel, scraped_tags, males, females, trans))
+            results.append({"status": "success", "title": title, "final_url": final_url})
+            existing_links.add(final_url)
+        except Exception as e:
+            logging.error(f"Error processing url {url}: {e}")
+            results.append({"status": "error", "url": url, "reason": str(e)})
+
+    if new_records:
+        STORAGE.append_videos(new_records)  # One append for the whole batch.
+        STORAGE.save_features(new_features)  # Raw inputs, so tags can be recomputed offline later.
+        CLASSIFICATION_CACHE.flush()
+        VIDEO_INDEX.invalidate()
+        for record in new_records:
+            get_or_generate_thumbnail(record.link)  # Served from the page just fetched, no second download.
 
     return jsonify(results), 201
 
@@ -201,32 +235,14 @@ def add_video():
 @video_bp.route("/remove", methods=["DELETE"])
 def remove_video():
     """Removes a video from the list."""
-    # This function remains correct.
     data = request.json
     link_to_remove = data.get("link")
     if not link_to_remove:
         return jsonify({"error": "Missing link"}), 400
-    if not os.path.exists(VIDEO_FILE):
-        return jsonify({"error": "Video file not found."}), 404
-
-    lines_to_keep, removed = [], False
-    with open(VIDEO_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().rsplit(' | ', 2)
-            if len(parts) == 3 and parts[2] == link_to_remove:
-                removed = True
-            else:
-                lines_to_keep.append(line)
-
-    if not removed:
-        return jsonify({"error": "Video not found in file."}), 404
-
-    with open(VIDEO_FILE, "w", encoding="utf-8") as f:
-        f.writelines(lines_to_keep)
-
-    with cache_lock:
-        if link_to_remove in THUMBNAIL_CACHE:
-            del THUMBNAIL_CACHE[link_to_remove]
-            save_cache()
+    if not STORAGE.remove_video(link_to_remove):
+        return jsonify({"error": "Video not found."}), 404
+
+    VIDEO_INDEX.invalidate()
+    THUMBNAIL_STORE.delete(link_to_remove)
 
     return jsonify({"message": "Video removed successfully."}), 200
\ No newline at end of file